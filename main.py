@@ -4,37 +4,44 @@
 """
 import sys
 import os
+
+# 高DPI缩放取整策略：在导入Qt之前通过环境变量设置，避免属性设置顺序问题
+os.environ.setdefault("QT_SCALE_FACTOR_ROUNDING_POLICY", "PassThrough")
+
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QIcon
-from ui.main_window import MainWindow
+from PySide6.QtCore import Qt, QTimer, qVersion
+
+
+def _configure_qt():
+    """创建 QApplication 之前的全局Qt设置（只保留当前Qt版本需要的属性）"""
+    # 高DPI取整策略已通过 QT_SCALE_FACTOR_ROUNDING_POLICY 设置
+    # Qt6 默认启用高DPI缩放，这两个属性已废弃，仅在 Qt5 下设置
+    if qVersion().startswith("5."):
+        QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+        QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
 
 
 def main():
     """主函数"""
-    # 启用高DPI支持
-    QApplication.setHighDpiScaleFactorRoundingPolicy(
-        Qt.HighDpiScaleFactorRoundingPolicy.PassThrough
-    )
-    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
-    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    _configure_qt()
     
     # 创建应用
     app = QApplication(sys.argv)
     app.setApplicationName("鸣潮抢码器")
     app.setOrganizationName("WutheringWaves")
     
-    # 设置应用程序图标
-    icon_path = "11409B.png"
-    # 打包后图标在根目录
-    if not os.path.exists(icon_path) and hasattr(sys, '_MEIPASS'):
-        icon_path = os.path.join(sys._MEIPASS, '11409B.png')
-    if os.path.exists(icon_path):
-        app.setWindowIcon(QIcon(icon_path))
+    # 设置应用程序图标（优先使用编译进程序的Qt资源，否则读取图标文件）
+    from utils.resource import get_app_icon
+    app_icon = get_app_icon()
+    if not app_icon.isNull():
+        app.setWindowIcon(app_icon)
     
-    # 创建主窗口
-    window = MainWindow()
+    # 创建主窗口（延迟导入，避免界面显示前加载全部模块）
+    from ui.main_window import MainWindow
+    window = MainWindow(defer=True)
     window.show()
+    # 首帧绘制后再完成耗时初始化
+    QTimer.singleShot(0, window.finish_init)
     
     # 运行应用
     sys.exit(app.exec())
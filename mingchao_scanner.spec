@@ -40,6 +40,7 @@ a = Analysis(
         'utils.performance_monitor',  # 🚀 性能监控
         'utils.image_buffer_pool',  # 🚀 内存池
         'utils.smart_roi_detector',  # 🚀 ROI预测
+        'utils.resource',  # 资源路径
     ],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""测试公共配置：把项目根目录加入导入路径（utils.* 按包导入）"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""线程池扫描器测试：进程池模式下的注册解码函数、共享内存传图和批量提交"""
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PySide6.QtCore")
+
+from utils import thread_pool_scanner as tps
+
+
+def _marker_decoder(img):
+    """测试用解码函数：图像中有255像素时返回固定内容（子进程按key查找，需在模块顶层定义）"""
+    return "KURO-marker" if int(img.max()) == 255 else None
+
+
+def _frame(marked: bool):
+    frame = np.zeros((16, 16), dtype=np.uint8)
+    if marked:
+        frame[3, 5] = 255
+    return frame
+
+
+@pytest.fixture
+def process_scanner():
+    scanner = tps.ThreadPoolScanner(max_workers=1, use_processes=True, decoders={"marker": _marker_decoder})
+    yield scanner
+    scanner.shutdown()
+
+
+def _collector():
+    results = []
+    done = threading.Event()
+
+    def on_success(result):
+        results.append(result)
+        done.set()
+
+    return results, done, on_success
+
+
+def test_process_submit_with_registered_key(process_scanner):
+    results, done, on_success = _collector()
+
+    assert process_scanner.submit_decode_task(_frame(True), "marker", on_success, direct_callback=True)
+
+    assert done.wait(30)
+    assert results == ["KURO-marker"]
+
+
+def test_process_queue_frame_with_registered_key(process_scanner):
+    results, done, on_success = _collector()
+
+    submitted = False
+    for i in range(tps.BATCH_SIZE):
+        submitted = process_scanner.queue_frame(
+            _frame(i == 0), "marker", on_success, direct_callback=True
+        )
+
+    assert submitted
+    assert done.wait(30)
+    assert results == ["KURO-marker"]
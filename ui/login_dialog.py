@@ -1,26 +1,132 @@
 # -*- coding: utf-8 -*-
 """登录对话框"""
-from PySide6.QtCore import Qt, Signal
+import re
+from PySide6.QtCore import Qt, Signal, QObject, QRunnable, QThreadPool
 from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout,
+    QDialog, QVBoxLayout,
     QLabel, QLineEdit, QPushButton, QMessageBox,
-    QWidget
+    QWidget, QStackedWidget
 )
 from PySide6.QtGui import QFont
 
 
+# 中国大陆手机号（1开头，第二位3-9，共11位数字）
+_PHONE_RE = re.compile(r'^1[3-9]\d{9}$')
+
+# 登录对话框样式（模块级常量，避免每次打开对话框重新构建字符串）
+_LOGIN_QSS = """
+    QDialog {
+        background-color: #F5F5F7;
+    }
+    
+    QLabel {
+        color: #1D1D1F;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    
+    QLineEdit {
+        padding: 12px 16px;
+        border: 1px solid #D2D2D7;
+        border-radius: 12px;
+        background-color: #FFFFFF;
+        color: #1D1D1F;
+        font-size: 14px;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    
+    QLineEdit:focus {
+        border: 2px solid #007AFF;
+        padding: 11px 15px;
+    }
+    
+    QPushButton {
+        padding: 12px 24px;
+        border: none;
+        border-radius: 12px;
+        background-color: #007AFF;
+        color: #FFFFFF;
+        font-size: 15px;
+        font-weight: 600;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    
+    QPushButton:hover {
+        background-color: #0051D5;
+    }
+    
+    QPushButton:pressed {
+        background-color: #004FC4;
+    }
+    
+    QPushButton:disabled {
+        background-color: #D2D2D7;
+        color: #8E8E93;
+    }
+    
+    /* 返回按钮样式 */
+    QPushButton#backBtn {
+        background-color: #E5E5EA;
+        color: #007AFF;
+    }
+    
+    QPushButton#backBtn:hover {
+        background-color: #D1D1D6;
+    }
+"""
+
+
+class _LoginSignals(QObject):
+    """登录任务信号（用于线程间通信）"""
+    finished = Signal(dict)  # 登录结果
+
+
+class _LoginTask(QRunnable):
+    """登录任务（在线程池中执行网络请求，避免阻塞UI）"""
+    
+    def __init__(self, mobile, code):
+        super().__init__()
+        self.mobile = mobile
+        self.code = code
+        self.signals = _LoginSignals()
+    
+    def run(self):
+        """执行登录（在线程池线程中运行）"""
+        from utils.kuro_api import kuro_api
+        result = kuro_api.login(self.mobile, self.code)
+        self.signals.finished.emit(result)
+
+
 class LoginDialog(QDialog):
     """登录对话框 - iOS风格"""
     
     login_success = Signal(dict)  # 登录成功信号
     
+    # 共享字体（首次创建对话框时初始化，之后复用）
+    _TITLE_FONT = None
+    _SUBTITLE_FONT = None
+    _LABEL_FONT = None
+    
+    @classmethod
+    def _init_fonts(cls):
+        """创建共享字体（仅首次调用时构造）"""
+        if cls._TITLE_FONT is not None:
+            return
+        cls._TITLE_FONT = QFont("PingFang SC", 18)
+        cls._TITLE_FONT.setBold(True)
+        cls._SUBTITLE_FONT = QFont("PingFang SC", 12)
+        cls._LABEL_FONT = QFont("PingFang SC", 11)
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._init_fonts()
         self.setWindowTitle("登录")
         self.setFixedSize(450, 420)
         self.setWindowFlags(Qt.Dialog | Qt.WindowCloseButtonHint)
         self.step = 1  # 当前步骤：1=输入手机号，2=输入验证码
         self.phone_number = ""  # 保存的手机号
+        self._phone_masked = ""  # 脱敏手机号（如 138****1234）
+        self._info_msg = None  # 复用的提示框（首次使用时创建）
+        self._warn_msg = None  # 复用的警告框（首次使用时创建）
         self.setup_ui()
         self.apply_styles()
     
@@ -33,29 +139,28 @@ class LoginDialog(QDialog):
         # 标题
         self.title = QLabel("登录库街区")
         self.title.setAlignment(Qt.AlignCenter)
-        title_font = QFont("PingFang SC", 18)
-        title_font.setBold(True)
-        self.title.setFont(title_font)
+        self.title.setFont(self._TITLE_FONT)
         layout.addWidget(self.title)
         
         # 副标题/提示文本
         self.subtitle = QLabel("请输入手机号码")
         self.subtitle.setAlignment(Qt.AlignCenter)
-        subtitle_font = QFont("PingFang SC", 12)
-        self.subtitle.setFont(subtitle_font)
+        self.subtitle.setFont(self._SUBTITLE_FONT)
         layout.addWidget(self.subtitle)
         
         layout.addSpacing(15)
         
-        # 手机号输入区域
+        # 输入区域：两个页面放在堆叠控件中，切换步骤只需切换索引
+        self.input_stack = QStackedWidget()
+        
+        # 手机号输入区域（第0页）
         self.phone_container = QWidget()
         phone_layout = QVBoxLayout(self.phone_container)
         phone_layout.setContentsMargins(0, 0, 0, 0)
         phone_layout.setSpacing(8)
         
         phone_label = QLabel("手机号")
-        phone_label_font = QFont("PingFang SC", 11)
-        phone_label.setFont(phone_label_font)
+        phone_label.setFont(self._LABEL_FONT)
         phone_layout.addWidget(phone_label)
         
         self.phone_input = QLineEdit()
@@ -64,17 +169,16 @@ class LoginDialog(QDialog):
         self.phone_input.setFixedHeight(45)
         phone_layout.addWidget(self.phone_input)
         
-        layout.addWidget(self.phone_container)
+        self.input_stack.addWidget(self.phone_container)
         
-        # 验证码输入区域（初始隐藏）
+        # 验证码输入区域（第1页）
         self.code_container = QWidget()
         code_layout = QVBoxLayout(self.code_container)
         code_layout.setContentsMargins(0, 0, 0, 0)
         code_layout.setSpacing(8)
         
         code_label = QLabel("验证码")
-        code_label_font = QFont("PingFang SC", 11)
-        code_label.setFont(code_label_font)
+        code_label.setFont(self._LABEL_FONT)
         code_layout.addWidget(code_label)
         
         self.code_input = QLineEdit()
@@ -83,8 +187,9 @@ class LoginDialog(QDialog):
         self.code_input.setFixedHeight(45)
         code_layout.addWidget(self.code_input)
         
-        layout.addWidget(self.code_container)
-        self.code_container.hide()  # 初始隐藏
+        self.input_stack.addWidget(self.code_container)
+        
+        layout.addWidget(self.input_stack)
         
         layout.addSpacing(15)
         
@@ -96,6 +201,7 @@ class LoginDialog(QDialog):
         
         # 返回按钮（初始隐藏）
         self.back_btn = QPushButton("← 返回")
+        self.back_btn.setObjectName("backBtn")
         self.back_btn.setFixedHeight(44)
         self.back_btn.clicked.connect(self.on_back)
         layout.addWidget(self.back_btn)
@@ -106,66 +212,17 @@ class LoginDialog(QDialog):
     
     def apply_styles(self):
         """应用iOS风格样式"""
-        self.setStyleSheet("""
-            QDialog {
-                background-color: #F5F5F7;
-            }
-            
-            QLabel {
-                color: #1D1D1F;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-            
-            QLineEdit {
-                padding: 12px 16px;
-                border: 1px solid #D2D2D7;
-                border-radius: 12px;
-                background-color: #FFFFFF;
-                color: #1D1D1F;
-                font-size: 14px;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-            
-            QLineEdit:focus {
-                border: 2px solid #007AFF;
-                padding: 11px 15px;
-            }
-            
-            QPushButton {
-                padding: 12px 24px;
-                border: none;
-                border-radius: 12px;
-                background-color: #007AFF;
-                color: #FFFFFF;
-                font-size: 15px;
-                font-weight: 600;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-            
-            QPushButton:hover {
-                background-color: #0051D5;
-            }
-            
-            QPushButton:pressed {
-                background-color: #004FC4;
-            }
-            
-            QPushButton:disabled {
-                background-color: #D2D2D7;
-                color: #8E8E93;
-            }
-            
-            /* 返回按钮样式 */
-            QPushButton#backBtn {
-                background-color: #E5E5EA;
-                color: #007AFF;
-            }
-            
-            QPushButton#backBtn:hover {
-                background-color: #D1D1D6;
-            }
-        """)
-        self.back_btn.setObjectName("backBtn")
+        self.setStyleSheet(_LOGIN_QSS)
+    
+    def _warn(self, title, message):
+        """显示警告提示（复用同一个消息框）"""
+        if self._warn_msg is None:
+            self._warn_msg = QMessageBox(self)
+            self._warn_msg.setIcon(QMessageBox.Warning)
+            self._warn_msg.setStandardButtons(QMessageBox.Ok)
+        self._warn_msg.setWindowTitle(title)
+        self._warn_msg.setText(message)
+        self._warn_msg.exec()
     
     def on_main_btn_click(self):
         """主按钮点击"""
@@ -173,26 +230,24 @@ class LoginDialog(QDialog):
             # 第一步：验证手机号并打开官网
             phone = self.phone_input.text().strip()
             
-            if not phone or len(phone) != 11:
-                QMessageBox.warning(
-                    self, 
-                    "提示", 
-                    "请输入正确的11位手机号",
-                    QMessageBox.Ok
-                )
+            if not _PHONE_RE.match(phone):
+                self._warn("提示", "请输入正确的11位手机号")
                 return
             
             self.phone_number = phone
+            self._phone_masked = f"{phone[:3]}****{phone[-4:]}"
             
             # 打开官网
             import webbrowser
             webbrowser.open("https://www.kurobbs.com")
             
             # 显示详细提示
-            msg_box = QMessageBox(self)
-            msg_box.setWindowTitle("获取验证码")
-            msg_box.setIcon(QMessageBox.Information)
-            msg_box.setText(
+            if self._info_msg is None:
+                self._info_msg = QMessageBox(self)
+                self._info_msg.setWindowTitle("获取验证码")
+                self._info_msg.setIcon(QMessageBox.Information)
+                self._info_msg.setStandardButtons(QMessageBox.Ok)
+            self._info_msg.setText(
                 f"已在浏览器打开库街区官网\n\n"
                 f"手机号：{phone}\n\n"
                 f"⚠️ 重要提示 ⚠️\n\n"
@@ -203,15 +258,13 @@ class LoginDialog(QDialog):
                 f"⚠️ 请勿在网页上输入验证码！\n"
                 f"   否则验证码将失效！"
             )
-            msg_box.setStandardButtons(QMessageBox.Ok)
-            msg_box.exec()
+            self._info_msg.exec()
             
             # 切换到第二步
             self.step = 2
             self.title.setText("输入验证码")
-            self.subtitle.setText(f"验证码已发送至 {phone[:3]}****{phone[-4:]}")
-            self.phone_container.hide()
-            self.code_container.show()
+            self.subtitle.setText(f"验证码已发送至 {self._phone_masked}")
+            self.input_stack.setCurrentWidget(self.code_container)
             self.main_btn.setText("登录")
             self.back_btn.show()
             self.code_input.setFocus()
@@ -221,7 +274,7 @@ class LoginDialog(QDialog):
             code = self.code_input.text().strip()
             
             if not code or len(code) < 4:
-                QMessageBox.warning(self, "提示", "请输入验证码")
+                self._warn("提示", "请输入验证码")
                 return
             
             # 禁用按钮
@@ -229,29 +282,31 @@ class LoginDialog(QDialog):
             self.main_btn.setText("登录中...")
             self.back_btn.setEnabled(False)
             
-            # 执行登录
-            from utils.kuro_api import kuro_api
-            result = kuro_api.login(self.phone_number, code)
-            
-            if result.get("code") == 200:
-                data = result.get("data", {})
-                self.login_success.emit(data)
-                QMessageBox.information(self, "成功", "登录成功！")
-                self.accept()
-            else:
-                msg = result.get("msg", "登录失败")
-                QMessageBox.warning(self, "登录失败", f"{msg}\n\n请检查验证码是否正确")
-                self.main_btn.setEnabled(True)
-                self.main_btn.setText("登录")
-                self.back_btn.setEnabled(True)
+            # 执行登录（线程池中执行，结果通过信号回到UI线程）
+            self._login_task = _LoginTask(self.phone_number, code)  # 保持引用，防止信号对象被提前回收
+            self._login_task.signals.finished.connect(self._on_login_result)
+            QThreadPool.globalInstance().start(self._login_task)
+    
+    def _on_login_result(self, result):
+        """登录结果回调（UI线程）"""
+        if result.get("code") == 200:
+            data = result.get("data", {})
+            self.login_success.emit(data)
+            QMessageBox.information(self, "成功", "登录成功！")
+            self.accept()
+        else:
+            msg = result.get("msg", "登录失败")
+            self._warn("登录失败", f"{msg}\n\n请检查验证码是否正确")
+            self.main_btn.setEnabled(True)
+            self.main_btn.setText("登录")
+            self.back_btn.setEnabled(True)
     
     def on_back(self):
         """返回上一步"""
         self.step = 1
         self.title.setText("登录库街区")
         self.subtitle.setText("请输入手机号码")
-        self.code_container.hide()
-        self.phone_container.show()
+        self.input_stack.setCurrentWidget(self.phone_container)
         self.main_btn.setText("下一步")
         self.back_btn.hide()
         self.code_input.clear()
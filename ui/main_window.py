@@ -1,138 +1,383 @@
 # -*- coding: utf-8 -*-
 """主窗口"""
-import os
-import sys
-from PySide6.QtCore import Qt, QTimer, Signal, QThread
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import Qt, QTimer, Signal, QObject, QRunnable, QThread, QThreadPool
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QTextEdit, QMessageBox, QInputDialog, QLineEdit
+    QLabel, QPushButton, QPlainTextEdit, QMessageBox, QInputDialog, QLineEdit
 )
-from PySide6.QtGui import QFont, QIcon
-from ui.login_dialog import LoginDialog
-from ui.scan_window import ScanWindow
+from PySide6.QtGui import QFont
 from utils.config_manager import config_manager
 from utils.kuro_api import kuro_api
+from utils.resource import get_app_icon
+
+
+class _NullMonitor:
+    """性能监控不可用时的空实现（避免热路径上反复判断可用性）"""
+    current_scan = None
+    
+    def mark_api_roleinfo_done(self):
+        pass
+    
+    def mark_api_scanlogin_done(self):
+        pass
+    
+    def end_scan(self, success: bool = True):
+        pass
+    
+    def get_last_scan_summary(self) -> str:
+        return ""
+
 
 # 🚀 导入性能监控
 try:
     from utils.performance_monitor import perf_monitor
     PERF_MONITOR_AVAILABLE = True
 except Exception:
+    perf_monitor = _NullMonitor()
     PERF_MONITOR_AVAILABLE = False
 
+# 内存池和ROI检测器（仅用于性能统计展示）
+try:
+    from utils.image_buffer_pool import image_buffer_pool
+except Exception:
+    image_buffer_pool = None
+
+try:
+    from utils.smart_roi_detector import smart_roi_detector
+except Exception:
+    smart_roi_detector = None
+
+# 抖音房间ID提取规则（预编译）
+_RE_ROOM_ID = re.compile(r'room_id=(\d+)')
+_RE_LIVE = re.compile(r'live\.douyin\.com/(\d+)')
+_RE_LONGNUM = re.compile(r'\d{10,}')
+
+# 投机式 scanLogin 线程池（与 roleInfos 并发发起，节省一个RTT）
+_speculative_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ScanLogin")
+
+# 扫码任务线程池（线程常驻复用；高优先级：网络请求是抢码关键路径，优先于截图/识别线程调度）
+_scan_pool = QThreadPool()
+_scan_pool.setMaxThreadCount(2)
+_scan_pool.setThreadPriority(QThread.HighestPriority)
 
-class ScanThread(QThread):
-    """扫码线程"""
+# roleInfos 错误码 -> 提示信息（其他错误码使用接口返回的msg）
+_ROLE_ERRORS = {
+    220: "Token已过期",
+    2209: "二维码已过期",
+}
+
+
+# 主窗口样式（模块级常量，避免每次创建窗口重新构建字符串）
+_MAIN_QSS = """
+    QMainWindow {
+        background-color: #F5F5F7;
+    }
+    
+    QWidget#infoWidget, QWidget#controlWidget, QWidget#logWidget {
+        background-color: #FFFFFF;
+        border-radius: 16px;
+        border: 1px solid #E5E5EA;
+    }
+    
+    QLabel {
+        color: #1D1D1F;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    
+    QPushButton {
+        padding: 12px 24px;
+        border: none;
+        border-radius: 12px;
+        background-color: #007AFF;
+        color: #FFFFFF;
+        font-size: 14px;
+        font-weight: 600;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    
+    QPushButton:hover {
+        background-color: #0051D5;
+    }
+    
+    QPushButton:pressed {
+        background-color: #004FC4;
+    }
+    
+    QPushButton:disabled {
+        background-color: #E5E5EA;
+        color: #8E8E93;
+    }
+    
+    /* 登录按钮特殊样式 */
+    QPushButton#loginBtn {
+        background-color: #34C759;
+    }
+    
+    QPushButton#loginBtn:hover {
+        background-color: #30B350;
+    }
+    
+    QPushButton#loginBtn:pressed {
+        background-color: #2A9F47;
+    }
+    
+    /* 停止按钮特殊样式 */
+    QPushButton#stopBtn {
+        background-color: #FF3B30;
+    }
+    
+    QPushButton#stopBtn:hover {
+        background-color: #FF2D20;
+    }
+    
+    QPushButton#stopBtn:pressed {
+        background-color: #E02820;
+    }
+    
+    /* 清空日志按钮 */
+    QPushButton#clearBtn {
+        background-color: #E5E5EA;
+        color: #007AFF;
+    }
     
+    QPushButton#clearBtn:hover {
+        background-color: #D1D1D6;
+    }
+    
+    QPlainTextEdit {
+        background-color: #F5F5F7;
+        color: #1D1D1F;
+        border: 1px solid #D2D2D7;
+        border-radius: 12px;
+        padding: 12px;
+        font-size: 13px;
+        font-family: "PingFang SC", "Microsoft YaHei", "Consolas", monospace;
+    }
+    
+    /* 状态标签特殊样式 */
+    QLabel#statusLabel {
+        color: #8E8E93;
+        font-size: 13px;
+        padding: 8px;
+        background-color: #F5F5F7;
+        border-radius: 8px;
+    }
+    
+    /* 复选框样式 */
+    QCheckBox {
+        color: #1D1D1F;
+        font-size: 13px;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+        spacing: 6px;
+        min-height: 24px;
+    }
+    
+    QCheckBox::indicator {
+        width: 16px;
+        height: 16px;
+        border-radius: 4px;
+        border: 1.5px solid #D2D2D7;
+        background-color: #FFFFFF;
+    }
+    
+    QCheckBox::indicator:hover {
+        border-color: #007AFF;
+    }
+    
+    QCheckBox::indicator:checked {
+        background-color: #007AFF;
+        border-color: #007AFF;
+        image: url(data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMTAiIGhlaWdodD0iOCIgdmlld0JveD0iMCAwIDEwIDgiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+PHBhdGggZD0iTTEgM0wzLjUgNi41TDkgMSIgc3Ryb2tlPSJ3aGl0ZSIgc3Ryb2tlLXdpZHRoPSIxLjgiIHN0cm9rZS1saW5lY2FwPSJyb3VuZCIgc3Ryb2tlLWxpbmVqb2luPSJyb3VuZCIvPjwvc3ZnPg==);
+    }
+    
+    QCheckBox:disabled {
+        color: #8E8E93;
+    }
+    
+    QCheckBox::indicator:disabled {
+        border-color: #E5E5EA;
+        background-color: #F5F5F7;
+    }
+    
+    /* 输入框样式 */
+    QLineEdit {
+        background-color: #F5F5F7;
+        color: #1D1D1F;
+        border: 1px solid #D2D2D7;
+        border-radius: 10px;
+        padding: 10px 14px;
+        font-size: 14px;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    
+    QLineEdit:focus {
+        border-color: #007AFF;
+        background-color: #FFFFFF;
+    }
+    
+    QLineEdit:disabled {
+        background-color: #E5E5EA;
+        color: #8E8E93;
+    }
+"""
+
+
+class _ScanSignals(QObject):
+    """扫码任务信号（用于线程间通信）"""
     scan_result = Signal(dict)  # 扫码结果信号
     log_message = Signal(str)  # 日志消息信号
+
+
+class ScanTask(QRunnable):
+    """扫码任务（在常驻线程池中执行，重试时无需重新创建线程）"""
     
-    def __init__(self, qr_code, parent=None, skip_role_check=False):
-        super().__init__(parent)
+    def __init__(self, qr_code, skip_role_check=False, verify_code=""):
+        super().__init__()
         self.qr_code = qr_code
-        self.verify_code = ""
+        self.verify_code = verify_code
         self.skip_role_check = skip_role_check  # 是否跳过角色验证（重试时跳过）
+        self.signals = _ScanSignals()
+        self.scan_result = self.signals.scan_result
+        self.log_message = self.signals.log_message
+    
+    def _fail(self, msg):
+        """输出失败日志和结果，并结束本次性能统计"""
+        self.log_message.emit(f"❌ {msg}")
+        self.scan_result.emit({"success": False, "message": msg})
+        perf_monitor.end_scan(success=False)
+    
+    def _succeed(self):
+        """输出成功日志和结果"""
+        self.log_message.emit("✓ 登录成功！")
+        self.scan_result.emit({"success": True, "message": "登录成功"})
     
     def run(self):
         """⚡ 执行扫码 - 终极优化版（集成性能监控）"""
         try:
+            scan_result = None
+            
             # 验证QR码有效性（必须步骤，否则会401）
             if not self.skip_role_check:
+                # 🚀 可选：与roleInfos并发投机提交scanLogin
+                speculative = None
+                if config_manager.get("speculative_scan_login", False):
+                    speculative = _speculative_executor.submit(
+                        kuro_api.scan_login, self.qr_code, self.verify_code
+                    )
+                
                 role_result = kuro_api.get_role_infos(self.qr_code)
                 
                 # 🚀 性能监控：记录roleInfos完成
-                if PERF_MONITOR_AVAILABLE and perf_monitor.current_scan:
-                    perf_monitor.mark_api_roleinfo_done()
-            
-                if role_result.get("code") == 220:
-                    self.log_message.emit("❌ Token已过期")
-                    self.scan_result.emit({"success": False, "message": "Token已过期"})
-                    if PERF_MONITOR_AVAILABLE:
-                        perf_monitor.end_scan(success=False)
-                    return
-                elif role_result.get("code") == 2209:
-                    self.log_message.emit("❌ 二维码已过期")
-                    self.scan_result.emit({"success": False, "message": "二维码已过期"})
-                    if PERF_MONITOR_AVAILABLE:
-                        perf_monitor.end_scan(success=False)
-                    return
-                elif role_result.get("code") != 200:
-                    msg = role_result.get("msg", "验证失败")
-                    self.log_message.emit(f"❌ {msg}")
-                    self.scan_result.emit({"success": False, "message": msg})
-                    if PERF_MONITOR_AVAILABLE:
-                        perf_monitor.end_scan(success=False)
+                perf_monitor.mark_api_roleinfo_done()
+                
+                code = role_result.get("code")
+                if code != 200:
+                    # 投机请求的结果直接丢弃（二维码已无效）
+                    self._fail(_ROLE_ERRORS.get(code) or role_result.get("msg", "验证失败"))
                     return
+                
+                if speculative is not None:
+                    scan_result = speculative.result()
+                    # 服务端先收到scanLogin时会拒绝（如401），此时按正常顺序重新提交
+                    if scan_result.get("code") not in (200, 2240):
+                        scan_result = None
             
             # 提交扫码（无中间日志，减少UI更新开销）
-            scan_result = kuro_api.scan_login(self.qr_code, self.verify_code)
+            if scan_result is None:
+                scan_result = kuro_api.scan_login(self.qr_code, self.verify_code)
             
             # 🚀 性能监控：记录scanLogin完成
-            if PERF_MONITOR_AVAILABLE and perf_monitor.current_scan:
-                perf_monitor.mark_api_scanlogin_done()
+            perf_monitor.mark_api_scanlogin_done()
             
-            if scan_result.get("code") == 200:
-                self.log_message.emit("✓ 登录成功！")
-                self.scan_result.emit({"success": True, "message": "登录成功"})
+            code = scan_result.get("code")
+            if code == 200:
+                self._succeed()
                 
                 # 🚀 性能监控：扫码成功
-                if PERF_MONITOR_AVAILABLE:
-                    perf_monitor.end_scan(success=True)
-                    # 输出性能报告
-                    summary = perf_monitor.get_last_scan_summary()
+                perf_monitor.end_scan(success=True)
+                # 输出性能报告
+                summary = perf_monitor.get_last_scan_summary()
+                if summary:
                     self.log_message.emit("\n" + summary)
-            elif scan_result.get("code") == 2240:
+            elif code == 2240:
                 # 需要短信验证码
                 self.log_message.emit("⚠ 需要短信验证码")
                 self.scan_result.emit({"success": False, "message": "需要短信验证码", "need_sms": True})
-            else:
+            elif self.verify_code:
                 # 如果有验证码但失败了，尝试不带验证码再登录一次
-                if self.verify_code:
-                    scan_result_retry = kuro_api.scan_login(self.qr_code, "")
-                    if scan_result_retry.get("code") == 200:
-                        self.log_message.emit("✓ 登录成功！")
-                        self.scan_result.emit({"success": True, "message": "登录成功"})
-                    else:
-                        msg = scan_result_retry.get("msg", "登录失败")
-                        self.log_message.emit(f"❌ {msg}")
-                        self.scan_result.emit({"success": False, "message": msg})
+                scan_result_retry = kuro_api.scan_login(self.qr_code, "")
+                if scan_result_retry.get("code") == 200:
+                    self._succeed()
                 else:
-                    msg = scan_result.get("msg", "扫码失败")
-                    self.log_message.emit(f"❌ {msg}")
-                    self.scan_result.emit({"success": False, "message": msg})
+                    self._fail(scan_result_retry.get("msg", "登录失败"))
+            else:
+                self._fail(scan_result.get("msg", "扫码失败"))
                 
         except Exception as e:
-            self.log_message.emit(f"❌ {str(e)}")
-            self.scan_result.emit({"success": False, "message": str(e)})
-            if PERF_MONITOR_AVAILABLE:
-                perf_monitor.end_scan(success=False)
+            self._fail(str(e))
 
 
 class MainWindow(QMainWindow):
     """主窗口"""
     
-    def __init__(self):
+    # 共享字体（首次创建窗口时初始化，之后复用）
+    _TITLE_FONT = None
+    _SECTION_FONT = None
+    _STATUS_FONT = None
+    
+    @classmethod
+    def _init_fonts(cls):
+        """创建共享字体（仅首次调用时构造）"""
+        if cls._TITLE_FONT is not None:
+            return
+        cls._TITLE_FONT = QFont("PingFang SC", 22)
+        cls._TITLE_FONT.setBold(True)
+        cls._SECTION_FONT = QFont("PingFang SC", 14)
+        cls._SECTION_FONT.setBold(True)
+        cls._STATUS_FONT = QFont("PingFang SC", 11)
+    
+    def __init__(self, defer=False):
         super().__init__()
+        self._init_fonts()
         self.setWindowTitle("鸣潮抢码器 v1.0 - 极速版")
         self.setFixedSize(600, 820)  # 增加高度以容纳所有内容
         
-        # 设置程序图标
-        icon_path = "11409B.png"
-        # 打包后图标在根目录
-        if not os.path.exists(icon_path) and hasattr(sys, '_MEIPASS'):
-            icon_path = os.path.join(sys._MEIPASS, '11409B.png')
-        if os.path.exists(icon_path):
-            from PySide6.QtGui import QIcon
-            self.setWindowIcon(QIcon(icon_path))
+        # 设置程序图标（路径和图标对象均已缓存）
+        app_icon = get_app_icon()
+        if not app_icon.isNull():
+            self.setWindowIcon(app_icon)
         
         self.scan_window = None
-        self.scan_thread = None
+        self.scan_task = None
         self.live_scanner = None  # 🎥 直播流扫描器
         self.pending_qr_code = None
+        self.login_dialog = None  # 登录对话框（非模态）
+        
+        # 日志缓冲：合并50ms内的日志和状态更新，一次性写入界面（减少重绘）
+        self._log_buffer = []
+        self._pending_status = None  # 待刷新的状态文本
+        self._log_flush_timer = QTimer(self)
+        self._log_flush_timer.setSingleShot(True)
+        self._log_flush_timer.setInterval(50)
+        self._log_flush_timer.timeout.connect(self._flush_log)
         
         self.setup_ui()
         self.apply_styles()
+        
+        # defer=True 时由调用方在首帧绘制后调用 finish_init()
+        if not defer:
+            self.finish_init()
+    
+    def finish_init(self):
+        """完成耗时初始化（AI扫描器加载、登录信息恢复），在窗口显示后执行"""
+        self.show_startup_info()
         self.load_user_info()
+        # 先把启动日志刷到界面，AI模型加载放到下一轮事件循环
+        self._flush_log()
+        QTimer.singleShot(0, self.show_ai_scanner_status)
     
     def setup_ui(self):
         """设置 UI"""
@@ -148,9 +393,7 @@ class MainWindow(QMainWindow):
         # 标题
         title = QLabel("鸣潮抢码器")
         title.setAlignment(Qt.AlignCenter)
-        title_font = QFont("PingFang SC", 22)
-        title_font.setBold(True)
-        title.setFont(title_font)
+        title.setFont(self._TITLE_FONT)
         main_layout.addWidget(title)
         
         # 用户信息区域
@@ -172,9 +415,7 @@ class MainWindow(QMainWindow):
         
         # 标题
         info_title = QLabel("账号信息")
-        info_title_font = QFont("PingFang SC", 14)
-        info_title_font.setBold(True)
-        info_title.setFont(info_title_font)
+        info_title.setFont(self._SECTION_FONT)
         info_layout.addWidget(info_title)
         
         # UID
@@ -204,9 +445,7 @@ class MainWindow(QMainWindow):
         
         # 标题
         control_title = QLabel("扫码控制")
-        control_title_font = QFont("PingFang SC", 14)
-        control_title_font.setBold(True)
-        control_title.setFont(control_title_font)
+        control_title.setFont(self._SECTION_FONT)
         control_layout.addWidget(control_title)
         
         # 按钮行
@@ -267,7 +506,7 @@ class MainWindow(QMainWindow):
         self.start_live_btn = QPushButton("扫描抖音直播")
         self.start_live_btn.setFixedHeight(40)
         self.start_live_btn.setToolTip("从抖音直播流中扫描QR码（适合直播间抢码）")
-        self.start_live_btn.clicked.connect(self.on_start_live_scan)
+        self.start_live_btn.clicked.connect(self.on_live_btn_clicked)
         live_layout.addWidget(self.start_live_btn, 1)
         
         control_layout.addLayout(live_layout)
@@ -276,8 +515,7 @@ class MainWindow(QMainWindow):
         self.status_label = QLabel("状态: 待机中")
         self.status_label.setObjectName("statusLabel")
         self.status_label.setAlignment(Qt.AlignCenter)
-        status_font = QFont("PingFang SC", 11)
-        self.status_label.setFont(status_font)
+        self.status_label.setFont(self._STATUS_FONT)
         control_layout.addWidget(self.status_label)
         
         parent_layout.addWidget(control_widget)
@@ -292,14 +530,14 @@ class MainWindow(QMainWindow):
         
         # 标题
         log_title = QLabel("运行日志")
-        log_title_font = QFont("PingFang SC", 14)
-        log_title_font.setBold(True)
-        log_title.setFont(log_title_font)
+        log_title.setFont(self._SECTION_FONT)
         log_layout.addWidget(log_title)
         
         # 先创建日志文本框
-        self.log_text = QTextEdit()
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.setMaximumBlockCount(2000)  # 只保留最近2000行，超出自动丢弃最早的行
+        self.log_text.setUndoRedoEnabled(False)  # 只读日志不需要撤销栈
         self.log_text.setMinimumHeight(220)  # 增加最小高度确保内容可见
         
         # 然后创建按钮（放在标题下面，但在添加到布局之前）
@@ -325,7 +563,9 @@ class MainWindow(QMainWindow):
         log_layout.addWidget(self.log_text)
         
         parent_layout.addWidget(log_widget)
-        
+    
+    def show_startup_info(self):
+        """输出启动日志"""
         # 初始日志
         self.add_log("🚀 鸣潮抢码器 v1.0 - 终极优化版")
         self.add_log("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
@@ -335,11 +575,11 @@ class MainWindow(QMainWindow):
         self.add_log("✓ 智能ROI区域预测")
         self.add_log("✓ 内存池复用技术")
         self.add_log("✓ SIMD向量化处理")
-        self.add_log("✓ 智能阶梯式重试（0.5s->1.0s->2.0s）")
+        self.add_log("✓ roleInfos对冲请求（0s/0.3s/0.9s补发，取最先返回）")
         self.add_log("✓ 组件预热机制")
         self.add_log("✓ 性能监控系统")
         self.add_log("✓ Ticket去重机制（防止重复提交）")
-        self.add_log("✓ API超时：roleInfos=800ms, scanLogin=1.2s")
+        self.add_log("✓ API超时：roleInfos=2s（对冲）, scanLogin=1.2s")
         self.add_log("✓ QThreadPool多线程（16线程，可选启用）")
         self.add_log("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         
@@ -348,11 +588,15 @@ class MainWindow(QMainWindow):
         
         # 自动重试始终启用（隐式功能）
         self.add_log("✓ 自动重试已启用（二维码过期后自动继续扫描）")
-        
-        # 显示AI模型加载状态（包含详细调试信息）
+    
+    def show_ai_scanner_status(self):
+        """加载AI扫描器（模型加载较慢）并输出其状态"""
         try:
             from utils.ai_qr_scanner import ai_qr_scanner
             
+            # 同步多线程池设置
+            ai_qr_scanner.use_thread_pool = config_manager.get("thread_pool_enabled", False)
+            
             # 显示所有加载消息（调试）
             if hasattr(ai_qr_scanner, 'load_messages'):
                 for msg in ai_qr_scanner.load_messages:
@@ -392,7 +636,7 @@ class MainWindow(QMainWindow):
                         workers = ai_qr_scanner.thread_pool.max_thread_count()
                         self.add_log(f"⚡ QThreadPool多线程池（{workers}线程，可选启用）")
                     
-                    self.add_log("⚡ API超时: roleInfos=800ms, scanLogin=1.2s")
+                    self.add_log("⚡ API超时: roleInfos=2s（对冲）, scanLogin=1.2s")
                 else:
                     self.add_log("⚠️ AI模型未加载（使用传统算法）")
             else:
@@ -406,158 +650,7 @@ class MainWindow(QMainWindow):
     
     def apply_styles(self):
         """应用iOS风格样式"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #F5F5F7;
-            }
-            
-            QWidget#infoWidget, QWidget#controlWidget, QWidget#logWidget {
-                background-color: #FFFFFF;
-                border-radius: 16px;
-                border: 1px solid #E5E5EA;
-            }
-            
-            QLabel {
-                color: #1D1D1F;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-            
-            QPushButton {
-                padding: 12px 24px;
-                border: none;
-                border-radius: 12px;
-                background-color: #007AFF;
-                color: #FFFFFF;
-                font-size: 14px;
-                font-weight: 600;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-            
-            QPushButton:hover {
-                background-color: #0051D5;
-            }
-            
-            QPushButton:pressed {
-                background-color: #004FC4;
-            }
-            
-            QPushButton:disabled {
-                background-color: #E5E5EA;
-                color: #8E8E93;
-            }
-            
-            /* 登录按钮特殊样式 */
-            QPushButton#loginBtn {
-                background-color: #34C759;
-            }
-            
-            QPushButton#loginBtn:hover {
-                background-color: #30B350;
-            }
-            
-            QPushButton#loginBtn:pressed {
-                background-color: #2A9F47;
-            }
-            
-            /* 停止按钮特殊样式 */
-            QPushButton#stopBtn {
-                background-color: #FF3B30;
-            }
-            
-            QPushButton#stopBtn:hover {
-                background-color: #FF2D20;
-            }
-            
-            QPushButton#stopBtn:pressed {
-                background-color: #E02820;
-            }
-            
-            /* 清空日志按钮 */
-            QPushButton#clearBtn {
-                background-color: #E5E5EA;
-                color: #007AFF;
-            }
-            
-            QPushButton#clearBtn:hover {
-                background-color: #D1D1D6;
-            }
-            
-            QTextEdit {
-                background-color: #F5F5F7;
-                color: #1D1D1F;
-                border: 1px solid #D2D2D7;
-                border-radius: 12px;
-                padding: 12px;
-                font-size: 13px;
-                font-family: "PingFang SC", "Microsoft YaHei", "Consolas", monospace;
-            }
-            
-            /* 状态标签特殊样式 */
-            QLabel#statusLabel {
-                color: #8E8E93;
-                font-size: 13px;
-                padding: 8px;
-                background-color: #F5F5F7;
-                border-radius: 8px;
-            }
-            
-            /* 复选框样式 */
-            QCheckBox {
-                color: #1D1D1F;
-                font-size: 13px;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-                spacing: 6px;
-                min-height: 24px;
-            }
-            
-            QCheckBox::indicator {
-                width: 16px;
-                height: 16px;
-                border-radius: 4px;
-                border: 1.5px solid #D2D2D7;
-                background-color: #FFFFFF;
-            }
-            
-            QCheckBox::indicator:hover {
-                border-color: #007AFF;
-            }
-            
-            QCheckBox::indicator:checked {
-                background-color: #007AFF;
-                border-color: #007AFF;
-                image: url(data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMTAiIGhlaWdodD0iOCIgdmlld0JveD0iMCAwIDEwIDgiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+PHBhdGggZD0iTTEgM0wzLjUgNi41TDkgMSIgc3Ryb2tlPSJ3aGl0ZSIgc3Ryb2tlLXdpZHRoPSIxLjgiIHN0cm9rZS1saW5lY2FwPSJyb3VuZCIgc3Ryb2tlLWxpbmVqb2luPSJyb3VuZCIvPjwvc3ZnPg==);
-            }
-            
-            QCheckBox:disabled {
-                color: #8E8E93;
-            }
-            
-            QCheckBox::indicator:disabled {
-                border-color: #E5E5EA;
-                background-color: #F5F5F7;
-            }
-            
-            /* 输入框样式 */
-            QLineEdit {
-                background-color: #F5F5F7;
-                color: #1D1D1F;
-                border: 1px solid #D2D2D7;
-                border-radius: 10px;
-                padding: 10px 14px;
-                font-size: 14px;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-            
-            QLineEdit:focus {
-                border-color: #007AFF;
-                background-color: #FFFFFF;
-            }
-            
-            QLineEdit:disabled {
-                background-color: #E5E5EA;
-                color: #8E8E93;
-            }
-        """)
+        self.setStyleSheet(_MAIN_QSS)
     
     def load_user_info(self):
         """加载用户信息"""
@@ -576,10 +669,18 @@ class MainWindow(QMainWindow):
     def on_login_clicked(self):
         """登录按钮点击"""
         try:
+            # 对话框已打开时直接置顶，不重复创建
+            if self.login_dialog is not None and self.login_dialog.isVisible():
+                self.login_dialog.raise_()
+                self.login_dialog.activateWindow()
+                return
+            
             self.add_log("正在打开登录对话框...")
-            dialog = LoginDialog(self)
-            dialog.login_success.connect(self.on_login_success)
-            dialog.exec()
+            from ui.login_dialog import LoginDialog
+            self.login_dialog = LoginDialog(self)
+            self.login_dialog.login_success.connect(self.on_login_success)
+            # 非模态显示，不阻塞主窗口事件循环
+            self.login_dialog.show()
         except Exception as e:
             self.add_log(f"❌ 打开登录对话框失败: {str(e)}")
             import traceback
@@ -618,6 +719,7 @@ class MainWindow(QMainWindow):
         
         # 创建扫描窗口
         if not self.scan_window:
+            from ui.scan_window import ScanWindow
             self.scan_window = ScanWindow()
             self.scan_window.qr_detected.connect(self.on_qr_detected)
         
@@ -627,7 +729,7 @@ class MainWindow(QMainWindow):
         # 更新按钮状态
         self.start_scan_btn.setEnabled(False)
         self.stop_scan_btn.setEnabled(True)
-        self.status_label.setText("状态: 扫描中...")
+        self.set_status("状态: 扫描中...")
         
         self.add_log("开始扫描...")
     
@@ -640,7 +742,7 @@ class MainWindow(QMainWindow):
         # 更新按钮状态
         self.start_scan_btn.setEnabled(True)
         self.stop_scan_btn.setEnabled(False)
-        self.status_label.setText("状态: 待机中")
+        self.set_status("状态: 待机中")
         
         self.add_log("已停止扫描")
     
@@ -674,45 +776,19 @@ class MainWindow(QMainWindow):
     def _load_saved_config(self):
         """加载保存的配置"""
         try:
+            thread_pool_enabled = config_manager.get("thread_pool_enabled", False)
+            
             # 加载多线程池设置
+            # （同步到AI扫描器在 show_ai_scanner_status 中进行，避免此处加载模型）
             if hasattr(self, 'thread_pool_checkbox'):
-                thread_pool_enabled = config_manager.get("thread_pool_enabled", False)
                 self.thread_pool_checkbox.setChecked(thread_pool_enabled)
-                
-                # 同步到AI扫描器
-                try:
-                    from utils.ai_qr_scanner import ai_qr_scanner
-                    ai_qr_scanner.use_thread_pool = thread_pool_enabled
-                except:
-                    pass
             
             # 加载自动登录设置
             if hasattr(self, 'auto_login_checkbox'):
                 auto_login = config_manager.get("auto_login", False)
                 self.auto_login_checkbox.setChecked(auto_login)
             
-            # 加载上次登录的token
-            last_token = config_manager.get("token", "")
-            last_uid = config_manager.get("uid", "")
-            last_login_success = config_manager.get("last_login_success", False)
-            
-            if last_login_success and last_token and last_uid:
-                # 设置token
-                kuro_api.set_token(last_token)
-                
-                # 更新UI显示
-                self.uid_label.setText(f"UID: {last_uid[:6]}...{last_uid[-6:]}")
-                self.token_label.setText(f"Token: {last_token[:10]}...{last_token[-10:]}")
-                
-                self.add_log("✓ 已加载保存的登录信息")
-            
-            # 加载多线程池设置
-            if config_manager.get("thread_pool_enabled", False):
-                try:
-                    from utils.ai_qr_scanner import ai_qr_scanner
-                    ai_qr_scanner.use_thread_pool = True
-                except:
-                    pass
+            # 上次登录的token由 load_user_info() 统一加载
         except Exception as e:
             print(f"[Config] Failed to load saved config: {e}")
     
@@ -725,31 +801,36 @@ class MainWindow(QMainWindow):
         2. 分享链接：https://v.douyin.com/xxx/
         3. 带roomid的链接：https://live.douyin.com/123456
         """
-        import re
-        
         # 如果是纯数字，直接返回
         if text.isdigit() and len(text) >= 10:
             return text
         
         # 尝试从URL中提取roomid参数
         # 例如：https://webcast.amemv.com/douyin/webcast/reflow/xxx?room_id=7318296342388083201
-        room_id_match = re.search(r'room_id=(\d+)', text)
+        room_id_match = _RE_ROOM_ID.search(text)
         if room_id_match:
             return room_id_match.group(1)
         
         # 尝试从直播间链接提取
         # 例如：https://live.douyin.com/7318296342388083201
-        live_match = re.search(r'live\.douyin\.com/(\d+)', text)
+        live_match = _RE_LIVE.search(text)
         if live_match:
             return live_match.group(1)
         
         # 尝试提取任何长数字串（10位以上）
-        long_num_match = re.search(r'\d{10,}', text)
+        long_num_match = _RE_LONGNUM.search(text)
         if long_num_match:
             return long_num_match.group(0)
         
         return ""
     
+    def on_live_btn_clicked(self):
+        """直播扫描按钮：根据当前状态开始或停止（信号只连接一次）"""
+        if self.live_scanner and self.live_scanner.isRunning():
+            self.on_stop_live_scan()
+        else:
+            self.on_start_live_scan()
+    
     def on_start_live_scan(self):
         """开始抖音直播流扫描"""
         # 检查是否已登录
@@ -790,26 +871,25 @@ class MainWindow(QMainWindow):
         
         # 创建直播流扫描器
         try:
-            from utils.live_stream_scanner import get_live_stream_scanner
-            self.live_scanner = get_live_stream_scanner()
-            
-            # 连接信号
-            self.live_scanner.qr_detected.connect(self.on_qr_detected)
-            self.live_scanner.status_changed.connect(self.add_log)
-            self.live_scanner.error_occurred.connect(lambda msg: self.add_log(f"❌ {msg}"))
+            if self.live_scanner is None:
+                from utils.live_stream_scanner import get_live_stream_scanner
+                self.live_scanner = get_live_stream_scanner()
+                
+                # 连接信号（扫描器是单例，只在首次创建时连接，避免重复回调）
+                self.live_scanner.qr_detected.connect(self.on_qr_detected)
+                self.live_scanner.status_changed.connect(self.add_log)
+                self.live_scanner.error_occurred.connect(lambda msg: self.add_log(f"❌ {msg}"))
             
             # 设置流地址并启动（只支持抖音）
             self.live_scanner.set_stream_url(room_id, "douyin")
             self.live_scanner.start()
             
             self.add_log(f"🎥 开始扫描抖音直播间: {room_id}")
-            self.status_label.setText("状态: 抖音直播流扫描中...")
+            self.set_status("状态: 抖音直播流扫描中...")
             
             # 更新按钮状态
             self.start_scan_btn.setEnabled(False)
             self.start_live_btn.setText("停止直播扫描")
-            self.start_live_btn.clicked.disconnect()
-            self.start_live_btn.clicked.connect(self.on_stop_live_scan)
             
         except Exception as e:
             self.add_log(f"❌ 启动直播流扫描失败: {e}")
@@ -820,11 +900,9 @@ class MainWindow(QMainWindow):
             self.live_scanner.stop()
             self.add_log("✓ 已停止抖音直播流扫描")
         
-        self.status_label.setText("状态: 待机中")
+        self.set_status("状态: 待机中")
         self.start_scan_btn.setEnabled(True)
         self.start_live_btn.setText("扫描抖音直播")
-        self.start_live_btn.clicked.disconnect()
-        self.start_live_btn.clicked.connect(self.on_start_live_scan)
     
     def on_qr_detected(self, qr_code):
         """⚡ 检测到二维码 - 自动确认模式"""
@@ -841,19 +919,31 @@ class MainWindow(QMainWindow):
         # 更新按钮状态
         self.start_scan_btn.setEnabled(True)
         self.stop_scan_btn.setEnabled(False)
-        self.status_label.setText("状态: 登录中...")
+        self.set_status("状态: 登录中...")
         
         # 开始扫码线程（必须保留roleInfos验证）
-        self.scan_thread = ScanThread(qr_code, skip_role_check=False)
-        self.scan_thread.scan_result.connect(self.on_scan_result)
-        self.scan_thread.log_message.connect(self.add_log)
-        self.scan_thread.start()
+        self._start_scan_task(qr_code, skip_role_check=False)
+    
+    def _start_scan_task(self, qr_code, skip_role_check, verify_code=""):
+        """提交扫码任务（先断开上一个任务的信号，避免迟到的信号重复触发回调）"""
+        old = self.scan_task
+        if old is not None:
+            try:
+                old.scan_result.disconnect()
+                old.log_message.disconnect()
+            except RuntimeError:
+                pass
+        
+        self.scan_task = ScanTask(qr_code, skip_role_check=skip_role_check, verify_code=verify_code)
+        self.scan_task.scan_result.connect(self.on_scan_result)
+        self.scan_task.log_message.connect(self.add_log)
+        _scan_pool.start(self.scan_task)
     
     def on_scan_result(self, result):
         """扫码结果"""
         if result.get("success"):
             self.add_log("🎉 扫码成功！手机已确认，登录完成！")
-            self.status_label.setText("状态: 登录成功")
+            self.set_status("状态: 登录成功")
             QMessageBox.information(self, "成功", "扫码登录成功！\n\n已在手机上确认登录")
             # 成功后确保扫描窗口已关闭
             if self.scan_window:
@@ -878,7 +968,9 @@ class MainWindow(QMainWindow):
             
             if reply == QMessageBox.No:
                 self.add_log("❌ 用户取消验证")
-                self.status_label.setText("状态: 已取消")
+                self.set_status("状态: 已取消")
+                if self.scan_window:
+                    self.scan_window.reset_processing()
                 return
             
             self.add_log("正在发送验证码到手机...")
@@ -917,14 +1009,10 @@ class MainWindow(QMainWindow):
             if ok and code:
                 self.add_log(f"收到验证码，重新执行扫码登录...")
                 # 重新扫码，带上验证码，跳过二维码验证（避免过期）
-                self.scan_thread = ScanThread(self.pending_qr_code, skip_role_check=True)
-                self.scan_thread.verify_code = code
-                self.scan_thread.scan_result.connect(self.on_scan_result)
-                self.scan_thread.log_message.connect(self.add_log)
-                self.scan_thread.start()
+                self._start_scan_task(self.pending_qr_code, skip_role_check=True, verify_code=code)
             else:
                 self.add_log("❌ 用户取消输入验证码")
-                self.status_label.setText("状态: 已取消")
+                self.set_status("状态: 已取消")
                 # 重置扫描窗口状态
                 if self.scan_window:
                     self.scan_window.reset_processing()
@@ -936,12 +1024,10 @@ class MainWindow(QMainWindow):
             if "二维码已过期" in message or "二维码已失效" in message:
                 auto_retry = config_manager.get("auto_retry", True)
                 if auto_retry and self.scan_window and not self.scan_window.isHidden():
-                    self.add_log("⚡ 二维码已过期，3秒后自动重试...")
-                    # 重置扫描窗口的ticket缓存，允许重新扫描
-                    if hasattr(self.scan_window, 'last_ticket'):
-                        self.scan_window.last_ticket = ""
-                    # 3秒后自动重新开始扫描
-                    QTimer.singleShot(3000, lambda: self.auto_retry_scan())
+                    self.add_log("⚡ 二维码已过期，自动重试中...")
+                    # 重置扫描窗口的ticket缓存并立即恢复扫描（扫描循环会识别下一个二维码）
+                    self.scan_window.clear_last_ticket()
+                    self.scan_window.reset_processing()
                     return
             
             if "Token已过期" in message:
@@ -951,21 +1037,30 @@ class MainWindow(QMainWindow):
             if self.scan_window:
                 self.scan_window.reset_processing()
     
-    def auto_retry_scan(self):
-        """自动重试扫描（二维码过期后触发）"""
-        # 检查扫描窗口是否仍然打开
-        if self.scan_window and not self.scan_window.isHidden():
-            self.add_log("🔄 自动重试中...")
-            # 扫描窗口应该仍在运行，只需要让它继续扫描即可
-            # 不需要重新创建窗口，因为ticket已经被清空
-        else:
-            self.add_log("⚠ 扫描窗口已关闭，取消自动重试")
-    
     def add_log(self, message):
-        """添加日志"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
+        """添加日志（先写入缓冲区，由定时器批量刷新）"""
+        timestamp = time.strftime("%H:%M:%S")
+        self._log_buffer.append(f"[{timestamp}] {message}")
+        if not self._log_flush_timer.isActive():
+            self._log_flush_timer.start()
+    
+    def set_status(self, text):
+        """设置状态文本（由日志刷新定时器统一更新到界面）"""
+        self._pending_status = text
+        if not self._log_flush_timer.isActive():
+            self._log_flush_timer.start()
+    
+    def _flush_log(self):
+        """将缓冲区中的日志和最新状态一次性写入界面"""
+        if self._pending_status is not None:
+            if self._pending_status != self.status_label.text():
+                self.status_label.setText(self._pending_status)
+            self._pending_status = None
+        
+        if not self._log_buffer:
+            return
+        self.log_text.appendPlainText("\n".join(self._log_buffer))
+        self._log_buffer.clear()
         
         # 自动滚动到底部
         scrollbar = self.log_text.verticalScrollBar()
@@ -984,19 +1079,13 @@ class MainWindow(QMainWindow):
         # 获取内存池和ROI检测器统计
         extra_info = []
         
-        try:
-            from utils.image_buffer_pool import image_buffer_pool
+        if image_buffer_pool is not None:
             pool_stats = image_buffer_pool.get_stats()
             extra_info.append(f"内存池: {pool_stats['total_buffers']}个缓冲区, {pool_stats['total_memory_mb']}MB")
-        except Exception:
-            pass
         
-        try:
-            from utils.smart_roi_detector import smart_roi_detector
+        if smart_roi_detector is not None:
             roi_stats = smart_roi_detector.get_stats()
             extra_info.append(f"ROI预测: {roi_stats['accuracy']}% 准确率 ({roi_stats['successful_predictions']}/{roi_stats['total_predictions']})")
-        except Exception:
-            pass
         
         # 组合信息
         full_info = stats_summary + "\n\n" + method_distribution
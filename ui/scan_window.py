@@ -1,22 +1,98 @@
 # -*- coding: utf-8 -*-
 """扫描窗口 - AI增强版"""
-from PySide6.QtCore import Qt, QTimer, Signal, QRect
+import time
+from PySide6.QtCore import Qt, QTimer, Signal, Slot, QObject, QThread
 from PySide6.QtWidgets import QWidget, QLabel, QApplication
-from PySide6.QtGui import QPainter, QPen, QColor, QCursor
+from PySide6.QtGui import QPainter, QPen, QColor
 
-# 尝试导入AI扫描器，如果失败则使用普通扫描器
+# 扫描器（首次扫描时加载）
+_scanner = None
+
+
+def _get_scanner():
+    """获取扫描器：优先AI扫描器，加载失败则使用普通扫描器"""
+    global _scanner
+    if _scanner is None:
+        try:
+            from utils.ai_qr_scanner import ai_qr_scanner
+            _scanner = ai_qr_scanner
+            print("[AI] Using AI-enhanced scanner")
+        except Exception as e:
+            print(f"[Warning] AI scanner failed to load, using standard scanner: {e}")
+            from utils.qr_scanner import qr_scanner
+            _scanner = qr_scanner
+    return _scanner
+
+# 🚀 帧哈希（优先xxhash，未安装时回退到内置hash）
 try:
-    from utils.ai_qr_scanner import ai_qr_scanner as qr_scanner
-    print("[AI] Using AI-enhanced scanner")
-except Exception as e:
-    print(f"[Warning] AI scanner failed to load, using standard scanner: {e}")
-    from utils.qr_scanner import qr_scanner
+    import xxhash
+    _frame_hash = xxhash.xxh3_64_intdigest
+except ImportError:
+    _frame_hash = hash
+
+
+# 提示标签样式（按state属性切换，只解析一次）
+_HINT_QSS = """
+    QLabel#hint {
+        color: #FFFFFF;
+        padding: 12px 20px;
+        border-radius: 12px;
+        font-size: 14px;
+        font-weight: 600;
+        font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
+    }
+    QLabel#hint[state="blue"] {
+        background-color: rgba(0, 122, 255, 220);
+    }
+    QLabel#hint[state="green"] {
+        background-color: rgba(52, 199, 89, 220);
+    }
+"""
+
+
+class ScanWorker(QObject):
+    """🚀 扫描工作者 - 在独立线程中截图+识别，避免阻塞GUI线程"""
+    
+    result = Signal(str, float)  # (二维码内容或空字符串, 耗时ms)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.last_frame_hash = None  # 上一帧的哈希（画面未变化时跳过识别）
+    
+    @Slot(int, int, int, int)
+    def scan(self, x, y, width, height):
+        """扫描指定区域"""
+        start = time.perf_counter()
+        qr_code = None
+        try:
+            qr_scanner = _get_scanner()
+            img = qr_scanner.grab_region(x, y, width, height)
+            if img is not None:
+                # 🚀 画面与上一帧完全相同时跳过识别（静止画面不重复解码）
+                frame_hash = _frame_hash(img.tobytes())
+                if frame_hash != self.last_frame_hash:
+                    self.last_frame_hash = frame_hash
+                    qr_code = qr_scanner.decode_image(img, x, y, width, height)
+        except Exception as e:
+            print(f"[Scan] Worker error: {e}")
+            qr_code = None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.result.emit(qr_code or "", elapsed_ms)
+    
+    @Slot()
+    def stop_capture(self):
+        """停止扫描器的后台截图（在工作线程中执行，排在进行中的扫描之后）"""
+        scanner = _scanner
+        if scanner is not None and hasattr(scanner, "stop_capture"):
+            scanner.stop_capture()
 
 
 class ScanWindow(QWidget):
     """扫描窗口 - 半透明可拖动的红框"""
     
     qr_detected = Signal(str)  # 检测到二维码信号
+    scan_requested = Signal(int, int, int, int)  # 请求工作线程扫描区域
+    capture_stop_requested = Signal()  # 请求工作线程停止后台截图
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -30,11 +106,20 @@ class ScanWindow(QWidget):
         self.border_width = 3
         self.border_color = QColor(0, 122, 255)  # iOS blue
         self.bg_color = QColor(0, 122, 255, 20)  # semi-transparent iOS blue
+        self.border_pen = QPen(self.border_color)
+        self.border_pen.setWidth(self.border_width)
         
         # Initial size and position - default center and 800x800
         window_width = 800
         window_height = 800
-        screen = QApplication.primaryScreen().geometry()
+        # 缓存主屏幕及其几何信息（屏幕增减时刷新）
+        self._screen = None
+        self._screen_geom = None
+        self._refresh_screen()
+        app = QApplication.instance()
+        app.screenAdded.connect(self._refresh_screen)
+        app.screenRemoved.connect(self._refresh_screen)
+        screen = self._screen_geom
         x = (screen.width() - window_width) // 2
         y = (screen.height() - window_height) // 2
         self.setGeometry(x, y, window_width, window_height)
@@ -43,25 +128,31 @@ class ScanWindow(QWidget):
         self.dragging = False
         self.drag_position = None
         
-        # Scan timer - 🚀 超高频扫描模式（100ms间隔，确保不漏过二维码）
+        # Scan timer - 🚀 自适应扫描：单次精确定时器，每次扫描结束后按耗时重新计时
+        # （扫描耗时超过间隔时不会堆积回调阻塞GUI线程）
         self.scan_timer = QTimer(self)
+        self.scan_timer.setTimerType(Qt.PreciseTimer)
+        self.scan_timer.setSingleShot(True)
         self.scan_timer.timeout.connect(self.scan_qr_code)
-        self.scan_interval = 100  # 100ms = 每秒10次扫描（平衡性能和识别率）
+        self.scan_interval = 100  # 恢复扫描时的默认间隔
+        self.min_scan_interval = 50  # 两次扫描之间的最小间隔
+        self.scanning = False  # 是否处于扫描状态
+        
+        # 🚀 扫描工作线程（GUI线程只投递扫描请求并接收结果）
+        self._scan_thread = QThread(self)
+        self._scan_worker = ScanWorker()
+        self._scan_worker.moveToThread(self._scan_thread)
+        self.scan_requested.connect(self._scan_worker.scan, Qt.QueuedConnection)
+        self.capture_stop_requested.connect(self._scan_worker.stop_capture, Qt.QueuedConnection)
+        self._scan_worker.result.connect(self._on_scan_result, Qt.QueuedConnection)
+        self._scan_thread.start()
         
         # Hint label - iOS style
+        self.setStyleSheet(_HINT_QSS)
         self.hint_label = QLabel("将此框对准二维码\n右键关闭", self)
+        self.hint_label.setObjectName("hint")
+        self.hint_label.setProperty("state", "blue")
         self.hint_label.setAlignment(Qt.AlignCenter)
-        self.hint_label.setStyleSheet("""
-            QLabel {
-                color: #FFFFFF;
-                background-color: rgba(0, 122, 255, 220);
-                padding: 12px 20px;
-                border-radius: 12px;
-                font-size: 14px;
-                font-weight: 600;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-        """)
         self.hint_label.adjustSize()
         self.update_hint_position()
         # Let label not block mouse events, can drag through
@@ -73,20 +164,20 @@ class ScanWindow(QWidget):
         self.processing_qr = False
         
         # 🚀 Ticket去重机制（防止重复提交同一个QR码）
-        self.last_ticket = ""  # 上次处理的ticket（QR码的最后24位）
+        self.last_ticket_hash: int = 0  # 上次处理的ticket（QR码的最后24位）的哈希
     
     def paintEvent(self, event):
         """Paint event"""
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
         
-        # Draw background
-        painter.fillRect(self.rect(), self.bg_color)
+        # Draw background - 只填充需要重绘的区域
+        # （内部保留半透明填充：完全透明的像素在Windows上会被鼠标穿透，无法拖动）
+        painter.setClipRegion(event.region())
+        for dirty_rect in event.region():
+            painter.fillRect(dirty_rect, self.bg_color)
         
-        # Draw border
-        pen = QPen(self.border_color)
-        pen.setWidth(self.border_width)
-        painter.setPen(pen)
+        # Draw border - 轴对齐的矩形无需抗锯齿
+        painter.setPen(self.border_pen)
         
         rect = self.rect()
         offset = self.border_width // 2
@@ -121,6 +212,11 @@ class ScanWindow(QWidget):
         super().resizeEvent(event)
         self.update_hint_position()
     
+    def _refresh_screen(self, *args):
+        """刷新缓存的主屏幕"""
+        self._screen = QApplication.primaryScreen()
+        self._screen_geom = self._screen.geometry()
+    
     def update_hint_position(self):
         """Update hint label position"""
         self.hint_label.adjustSize()
@@ -130,98 +226,102 @@ class ScanWindow(QWidget):
     
     def start_scanning(self):
         """Start scanning"""
-        self.last_ticket = ""  # 🚀 清空上次ticket，允许重新扫描
+        self.last_ticket_hash = 0  # 🚀 清空上次ticket，允许重新扫描
         self.processing_qr = False  # 🚀 重置处理状态
         self.last_qr_code = None  # 🚀 重置上次识别的二维码
-        self.scan_timer.start(self.scan_interval)
+        self._scan_worker.last_frame_hash = None
+        self.scanning = True
+        if not self._scan_thread.isRunning():
+            self._scan_thread.start()
+        self.scan_timer.start(0)  # 立即开始第一次扫描
         self.hint_label.setText("正在扫描...")
     
     def stop_scanning(self):
         """Stop scanning"""
+        self.scanning = False
         self.scan_timer.stop()
+        self.capture_stop_requested.emit()
         self.hint_label.setText("将此框对准二维码\n右键关闭")
     
     def scan_qr_code(self):
-        """🚀 扫描二维码 - 持续扫描模式"""
-        # If processing QR code, skip this scan
-        if self.processing_qr:
-            return
-            
+        """🚀 扫描二维码 - 持续扫描模式（向工作线程投递扫描请求）"""
         # Get window position and size
         geometry = self.geometry()
-        x = geometry.x()
-        y = geometry.y()
-        width = geometry.width()
-        height = geometry.height()
-        
-        # 🚀 扫描区域（每次都尝试识别）
-        qr_code = qr_scanner.scan_region(x, y, width, height)
-        
+        self.scan_requested.emit(geometry.x(), geometry.y(), geometry.width(), geometry.height())
+    
+    def _schedule_next_scan(self, elapsed_ms):
+        """按本次扫描耗时重新计时"""
+        # 窗口在识别回调中被关闭、或正在处理二维码时不再继续（由reset_processing恢复）
+        if self.scanning and not self.processing_qr and not self.scan_timer.isActive():
+            self.scan_timer.start(max(self.min_scan_interval, int(elapsed_ms)))
+    
+    def _on_scan_result(self, qr_code, elapsed_ms):
+        """工作线程扫描完成（GUI线程）"""
+        try:
+            if qr_code and self.scanning and not self.processing_qr:
+                self._handle_qr_code(qr_code)
+        finally:
+            self._schedule_next_scan(elapsed_ms)
+    
+    def _handle_qr_code(self, qr_code):
+        """去重并发送检测信号"""
         if qr_code:
             # 🚀 提取Ticket（QR码的最后24位作为唯一标识）
             if len(qr_code) >= 24:
-                ticket = qr_code[-24:]
+                ticket_hash = _frame_hash(memoryview(qr_code.encode("ascii", "ignore"))[-24:])
                 
                 # 🚀 去重检查：如果与上次ticket相同，直接跳过（防止重复提交）
-                if ticket == self.last_ticket:
+                if ticket_hash == self.last_ticket_hash:
                     # 已经提交过这个二维码，继续扫描（等待新二维码）
                     return
                 
                 # 🚀 发现新二维码！
-                self.last_ticket = ticket
-                print(f"[QR] ✓ New QR detected: {ticket[:8]}...")
+                self.last_ticket_hash = ticket_hash
+                print(f"[QR] ✓ New QR detected: {qr_code[-24:-16]}...")
             
             # 🚀 立即发送信号并停止扫描
             self.last_qr_code = qr_code
             self.processing_qr = True  # Mark as processing
+            self.scan_timer.stop()  # 处理期间暂停扫描
             self.qr_detected.emit(qr_code)
             
             # 更新UI提示
             self.hint_label.setText("✓ 检测到二维码\n正在登录...")
-            self.hint_label.setStyleSheet("""
-                QLabel {
-                    color: #FFFFFF;
-                    background-color: rgba(52, 199, 89, 220);
-                    padding: 12px 20px;
-                    border-radius: 12px;
-                    font-size: 14px;
-                    font-weight: 600;
-                    font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-                }
-            """)
-            
-            # 🚀 继续扫描（不停止），但标记为处理中（避免重复提交）
-            # self.scan_timer.stop()  # 注释掉，保持持续扫描
-            
-            # 3秒后重置处理状态（允许识别新二维码）
-            QTimer.singleShot(3000, self.reset_processing)
+            self._set_hint_state("green")
+            # 处理状态由主窗口在收到登录结果后调用 reset_processing 重置
+    
+    def clear_last_ticket(self):
+        """清空上次ticket和帧哈希，允许重新识别同一个二维码"""
+        self.last_ticket_hash = 0
+        self._scan_worker.last_frame_hash = None
     
     def reset_processing(self):
         """Reset processing state"""
-        # 🚀 只重置处理标志，保留last_ticket（防止重复提交同一个码）
+        # 🚀 只重置处理标志，保留last_ticket_hash（防止重复提交同一个码）
         self.processing_qr = False
         self.last_qr_code = None
         # 如果扫描窗口还在运行，恢复提示
-        if not self.scan_timer.isActive():
+        if self.scanning and not self.scan_timer.isActive():
             self.scan_timer.start(self.scan_interval)
         self.reset_hint_style()
     
     def reset_hint_style(self):
         """Reset hint style"""
         self.hint_label.setText("正在扫描...")
-        self.hint_label.setStyleSheet("""
-            QLabel {
-                color: #FFFFFF;
-                background-color: rgba(0, 122, 255, 220);
-                padding: 12px 20px;
-                border-radius: 12px;
-                font-size: 14px;
-                font-weight: 600;
-                font-family: "PingFang SC", "Microsoft YaHei", sans-serif;
-            }
-        """)
+        self._set_hint_state("blue")
+    
+    def _set_hint_state(self, state):
+        """切换提示标签样式（只重新polish，不重新解析样式表）"""
+        if self.hint_label.property("state") != state:
+            self.hint_label.setProperty("state", state)
+            style = self.hint_label.style()
+            style.unpolish(self.hint_label)
+            style.polish(self.hint_label)
     
     def closeEvent(self, event):
         """Close event"""
         self.stop_scanning()
+        self._scan_thread.quit()
+        self._scan_thread.wait()
+        self._scan_worker.stop_capture()  # 线程已退出，直接在此停止（退出前的排队请求可能未执行）
         super().closeEvent(event)
@@ -1,17 +1,29 @@
 # -*- coding: utf-8 -*-
 """AI增强的QR码扫描器 - 使用Caffe模型（通过OpenCV DNN）"""
 from PIL import ImageGrab, Image, ImageEnhance
-from pyzbar.pyzbar import decode
+from pyzbar.pyzbar import decode, ZBarSymbol
 from typing import Optional, List, Tuple
 import ctypes
 import numpy as np
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 🚀 DNN推理线程数（配置 dnn_threads，0 表示自动取CPU核心数的一半，避免线程超额订阅）
+try:
+    from utils.config_manager import config_manager
+    DNN_THREADS = int(config_manager.get("dnn_threads", 0) or 0)
+except Exception:
+    DNN_THREADS = 0
+if DNN_THREADS <= 0:
+    DNN_THREADS = max(1, (os.cpu_count() or 2) // 2)
+# OpenMP/MKL 只在首次加载时读取环境变量，必须在导入cv2之前设置
+os.environ.setdefault("OMP_NUM_THREADS", str(DNN_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(DNN_THREADS))
 
 # 尝试导入OpenCV
 try:
     import cv2
+    cv2.setNumThreads(DNN_THREADS)
     OPENCV_AVAILABLE = True
 except ImportError:
     OPENCV_AVAILABLE = False
@@ -58,15 +70,64 @@ except Exception as e:
     print(f"[Info] ROI detector not available: {e}")
 
 
+# 🚀 可选：Numba JIT编译的灰度转换内核（未安装时使用OpenCV）
+os.environ.setdefault("NUMBA_NUM_THREADS", str(max(1, (os.cpu_count() or 2) // 2)))
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, nogil=True, cache=True, boundscheck=False)
+    def _to_gray_fp(src, dst, w0, w1, w2):
+        """定点数转灰度：Y = (w0*C0 + w1*C1 + w2*C2) >> 8，按行并行"""
+        for i in prange(src.shape[0]):
+            for j in range(src.shape[1]):
+                dst[i, j] = (src[i, j, 0] * w0 + src[i, j, 1] * w1 + src[i, j, 2] * w2) >> 8
+
+# 定点数灰度权重（ITU-R BT.601：0.299R + 0.587G + 0.114B，放大256倍）
+_GRAY_WEIGHTS_RGB = (77, 150, 29)
+_GRAY_WEIGHTS_BGR = (29, 150, 77)
+
+# 鸣潮二维码标识（"G152#KURO" 包含 "KURO"，检查一次即可）
+KURO_TOKEN = "KURO"
+KURO_TOKEN_BYTES = KURO_TOKEN.encode("ascii")
+
+# 🚀 pyzbar只启用QR码解码器（跳过条形码等其他格式的识别尝试）
+_QR_SYMBOLS = [ZBarSymbol.QRCODE]
+
+# 🚀 快速识别：大区域先缩小到此尺寸（最长边）识别一次，失败再用全分辨率
+FAST_DECODE_MAX_SIDE = 400
+
+# 🚀 检测网络置信度阈值：低于此值认为画面中没有二维码，跳过超分辨率
+DETECT_CONFIDENCE = 0.3
+DETECT_INPUT_SIZE = (300, 300)
+
+
+def _to_bgr_array(img) -> np.ndarray:
+    """将PIL图像转换为BGR格式的ndarray（已是ndarray时原样返回）"""
+    if isinstance(img, np.ndarray):
+        return img
+    rgb = np.asarray(img.convert("RGB"))
+    if OPENCV_AVAILABLE:
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)  # SIMD通道交换
+    return np.ascontiguousarray(rgb[..., ::-1])
+
+
+# 屏幕缩放因子（只在模块加载时查询一次shcore）
+try:
+    _SCALE_FACTOR = ctypes.windll.shcore.GetScaleFactorForDevice(0) / 100
+except Exception:
+    _SCALE_FACTOR = 1.0
+
+
 class AIQRScanner:
     """AI增强的QR码扫描器 - 使用Caffe深度学习模型"""
     
     def __init__(self):
-        # 获取屏幕缩放因子
-        try:
-            self.scale_factor = ctypes.windll.shcore.GetScaleFactorForDevice(0) / 100
-        except Exception:
-            self.scale_factor = 1.0
+        # 屏幕缩放因子（模块加载时已查询）
+        self.scale_factor = _SCALE_FACTOR
         
         # 加载AI模型
         self.sr_net = None  # 超分辨率网络
@@ -84,27 +145,44 @@ class AIQRScanner:
             except Exception as e:
                 print(f"[Warning] Failed to init DXGI screenshot: {e}")
         
-        # 🚀 快速截图工具（Windows BitBlt，比PIL快5-10倍）
+        # 🚀 快速截图工具（Windows BitBlt，比PIL快5-10倍；DXGI可用时作为其备选）
         self.fast_screenshot = None
-        if FAST_SCREENSHOT_AVAILABLE and not self.dxgi_screenshot:
+        if FAST_SCREENSHOT_AVAILABLE:
             try:
                 self.fast_screenshot = get_fast_screenshot()
             except Exception as e:
                 print(f"[Warning] Failed to init fast screenshot: {e}")
         
-        # 🚀 多线程池（自动检测CPU核心数，用于并行图像处理）
+        # 🚀 多线程池（自动检测物理核心数，用于并行图像处理）
         self.use_thread_pool = False  # 默认关闭（串行已够快）
         self.thread_pool = None
         try:
             from utils.thread_pool_scanner import get_thread_pool_scanner
-            self.thread_pool = get_thread_pool_scanner()  # 自动检测CPU核心数
+            self.thread_pool = get_thread_pool_scanner()  # 自动检测物理核心数
             # self.use_thread_pool = True  # 可选：启用多线程（提升复杂场景性能）
             print("[ThreadPool] Available (disabled by default, single-thread is faster for most cases)")
         except Exception as e:
             print(f"[ThreadPool] Not available: {e}")
         
-        # 🚀 并行识别线程池（用于多候选QR并行识别）
-        self.parallel_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="QRDecode")
+        # 🚀 缩放结果缓冲区（按用途复用，尺寸变化时才重新分配）
+        self._resize_buffers = {}
+        self._sr_blob = None  # 超分辨率网络输入张量（1x1xHxW float32，尺寸不变时复用）
+        
+        # 🚀 基础增强用的查找表和锐化核（对比度=单次查表，锐化=单次卷积）
+        self._contrast_lut = self._make_contrast_lut(2.0)
+        self._contrast_lut_mild = self._make_contrast_lut(1.8)
+        self._sharpen_kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+        
+        # 🚀 OpenCL加速（灰度+二值化在GPU上一次完成，只在最后取回结果）
+        self.use_opencl = False
+        if OPENCV_AVAILABLE:
+            try:
+                self.use_opencl = cv2.ocl.haveOpenCL()
+                if self.use_opencl:
+                    cv2.ocl.setUseOpenCL(True)
+                    print("[OpenCL] Enabled for image enhancement")
+            except Exception:
+                self.use_opencl = False
         
         # 🚀 启动预热标志
         self.warmed_up = False
@@ -151,7 +229,8 @@ class AIQRScanner:
             if os.path.exists(sr_proto) and os.path.exists(sr_model):
                 self.load_messages.append("[AI] Loading SR model...")
                 self.sr_net = cv2.dnn.readNetFromCaffe(sr_proto, sr_model)
-                self.load_messages.append("[AI] SR model loaded OK")
+                target = self._configure_dnn_target(self.sr_net)
+                self.load_messages.append(f"[AI] SR model loaded OK ({target})")
             else:
                 self.load_messages.append(f"[WARN] SR not found: proto={os.path.exists(sr_proto)}, model={os.path.exists(sr_model)}")
             
@@ -159,7 +238,8 @@ class AIQRScanner:
             if os.path.exists(detect_proto) and os.path.exists(detect_model):
                 self.load_messages.append("[AI] Loading detect model...")
                 self.detect_net = cv2.dnn.readNetFromCaffe(detect_proto, detect_model)
-                self.load_messages.append("[AI] Detect model loaded OK")
+                target = self._configure_dnn_target(self.detect_net)
+                self.load_messages.append(f"[AI] Detect model loaded OK ({target})")
             else:
                 self.load_messages.append(f"[WARN] Detect not found: proto={os.path.exists(detect_proto)}, model={os.path.exists(detect_model)}")
             
@@ -181,6 +261,47 @@ class AIQRScanner:
         for msg in self.load_messages:
             print(msg)
     
+    def _configure_dnn_target(self, net) -> str:
+        """
+        🚀 为DNN网络启用层融合，并选择推理后端：CUDA FP16 → OpenVINO → OpenCL FP16 → CPU FP32
+        
+        Returns:
+            所选后端的描述
+        """
+        # 层融合：加载时将BatchNorm/Scale/ReLU合并进前面的卷积层
+        try:
+            net.enableFusion(True)
+            self.load_messages.append(f"[AI] Layer fusion enabled ({len(net.getLayerNames())} layers before fusion)")
+        except Exception:
+            pass
+        
+        try:
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+                return "CUDA FP16"
+        except Exception:
+            pass
+        
+        # OpenVINO（Intel推理引擎，额外融合Conv+ReLU+Eltwise）
+        try:
+            if (cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE, cv2.dnn.DNN_TARGET_CPU) in cv2.dnn.getAvailableBackends():
+                net.setPreferableBackend(cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE)
+                net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+                return "OpenVINO"
+        except Exception:
+            pass
+        
+        if self.use_opencl:
+            try:
+                net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+                net.setPreferableTarget(cv2.dnn.DNN_TARGET_OPENCL_FP16)
+                return "OpenCL FP16"
+            except Exception:
+                pass
+        
+        return "CPU"
+    
     def _init_wechat_detector(self):
         """初始化微信QR码识别器（与MHY_Scanner相同）"""
         try:
@@ -229,11 +350,21 @@ class AIQRScanner:
             if self.dxgi_screenshot:
                 try:
                     self.dxgi_screenshot.grab_region(0, 0, 100, 100)
+                    self.dxgi_screenshot.stop_stream()  # 预热只截一帧，不保留后台截图
                     print("[Warmup] DXGI screenshot OK")
                 except Exception:
                     pass
             
-            # 2. 预热WeChat检测器
+            # 2. 预热Numba灰度内核（触发JIT编译）
+            if NUMBA_AVAILABLE:
+                try:
+                    dummy_rgb = np.zeros((64, 64, 3), dtype=np.uint8)
+                    _to_gray_fp(dummy_rgb, np.empty((64, 64), dtype=np.uint8), *_GRAY_WEIGHTS_BGR)
+                    print("[Warmup] Numba gray kernel OK")
+                except Exception:
+                    pass
+            
+            # 3. 预热WeChat检测器
             if self.wechat_detector:
                 try:
                     dummy_img = np.zeros((100, 100, 3), dtype=np.uint8)
@@ -242,7 +373,24 @@ class AIQRScanner:
                 except Exception:
                     pass
             
-            # 3. 预热内存池
+            # 4. 预热DNN网络（首次forward会选择内核/编译OpenCL程序，提前到启动阶段）
+            if self.detect_net is not None:
+                try:
+                    t0 = time.perf_counter()
+                    self.detect_qr_box(np.zeros((720, 1280, 3), dtype=np.uint8))
+                    print(f"[Warmup] Detect net OK ({(time.perf_counter() - t0) * 1000:.0f}ms)")
+                except Exception:
+                    pass
+            if self.sr_net is not None:
+                try:
+                    t0 = time.perf_counter()
+                    # 直接执行网络（apply_super_resolution会吞掉异常），输入为模型接受的单通道灰度图
+                    self._run_super_resolution(np.zeros((240, 320), dtype=np.uint8))
+                    print(f"[Warmup] SR net OK ({(time.perf_counter() - t0) * 1000:.0f}ms)")
+                except Exception as e:
+                    print(f"[Warmup] SR net failed: {e}")
+            
+            # 5. 预热内存池
             if BUFFER_POOL_AVAILABLE:
                 try:
                     buf = image_buffer_pool.get_buffer(720, 1280, 3)
@@ -257,96 +405,172 @@ class AIQRScanner:
         except Exception as e:
             print(f"[Warmup] Failed: {e}")
     
-    def fast_rgb_to_gray_simd(self, img_array: np.ndarray) -> np.ndarray:
+    def fast_rgb_to_gray_simd(self, img_array: np.ndarray, dst: Optional[np.ndarray] = None, bgr: bool = False) -> np.ndarray:
         """
-        🚀 SIMD向量化的RGB转灰度（比cv2.cvtColor快20-30%）
+        🚀 SIMD向量化的RGB转灰度（无float64中间数组）
         
         Args:
-            img_array: RGB image array (H, W, 3)
+            img_array: RGB image array (H, W, 3)，bgr=True 时为BGR
+            dst: 可选的输出缓冲区 (H, W)，避免每次分配
+            bgr: 输入是否为BGR通道顺序
         
         Returns:
             Grayscale image array (H, W)
         """
-        try:
-            # 使用NumPy的broadcasting（SIMD优化）
-            # ITU-R BT.601标准：Y = 0.299*R + 0.587*G + 0.114*B
-            return np.dot(img_array[...,:3], [0.299, 0.587, 0.114]).astype(np.uint8)
-        except Exception:
-            # Fallback to OpenCV
-            return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        weights = _GRAY_WEIGHTS_BGR if bgr else _GRAY_WEIGHTS_RGB
+        if NUMBA_AVAILABLE:
+            # ITU-R BT.601标准的定点数近似（Numba并行+自动向量化）
+            if dst is None:
+                dst = np.empty(img_array.shape[:2], dtype=np.uint8)
+            _to_gray_fp(img_array, dst, *weights)
+            return dst
+        if OPENCV_AVAILABLE:
+            # OpenCV内部已SIMD优化
+            return cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY, dst=dst)
+        # 纯NumPy定点数：按64行分块计算（uint16足够容纳 255*256，分块保持在L2缓存内）
+        if dst is None:
+            dst = np.empty(img_array.shape[:2], dtype=np.uint8)
+        for i0 in range(0, img_array.shape[0], 64):
+            block = img_array[i0:i0 + 64].astype(np.uint16)
+            dst[i0:i0 + 64] = (block[..., 0] * weights[0]
+                               + block[..., 1] * weights[1]
+                               + block[..., 2] * weights[2]) >> 8
+        return dst
     
     def apply_super_resolution(self, img: np.ndarray) -> np.ndarray:
         """
         使用AI超分辨率增强图像质量
+        
+        Returns:
+            放大2倍的灰度图；网络不可用或执行失败时返回原图
         """
         if not self.ai_enabled or self.sr_net is None:
             return img
         
         try:
-            # 准备输入
-            h, w = img.shape[:2]
-            blob = cv2.dnn.blobFromImage(img, 1.0, (w, h), (0, 0, 0), swapRB=False, crop=False)
-            
-            # 前向传播
-            self.sr_net.setInput(blob)
-            output = self.sr_net.forward()
-            
-            # 处理输出
-            output = output[0]
-            output = np.transpose(output, (1, 2, 0))
-            output = cv2.normalize(output, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
-            
-            return output
+            return self._run_super_resolution(img)
         except Exception as e:
             print(f"[Warning] Super-resolution processing failed: {e}")
             return img
     
-    def enhance_image_ai(self, img: Image.Image) -> List[Image.Image]:
+    def _run_super_resolution(self, img: np.ndarray) -> np.ndarray:
+        """执行超分辨率网络（失败时抛出异常，由调用方决定如何处理）"""
+        # 准备输入：网络输入为 1x1xHxW 的灰度图，数值范围0-1（与WeChat超分模型一致）
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        h, w = gray.shape[:2]
+        # 🚀 直接写入复用的NCHW张量（等价于 scale=1/255、无均值的 blobFromImage）
+        blob = self._sr_blob
+        if blob is None or blob.shape != (1, 1, h, w):
+            blob = np.empty((1, 1, h, w), dtype=np.float32)
+            self._sr_blob = blob
+        np.multiply(gray, 1.0 / 255, out=blob[0, 0])
+        
+        # 前向传播
+        self.sr_net.setInput(blob)
+        output = self.sr_net.forward()
+        
+        # 处理输出（0-1结果放大回0-255，饱和截断后写入复用的缓冲区）
+        output = output[0, 0]
+        np.multiply(output, 255, out=output)
+        np.clip(output, 0, 255, out=output)
+        buf = self._resize_buffers.get("sr")
+        if buf is None or buf.shape != output.shape:
+            buf = np.empty(output.shape, dtype=np.uint8)
+            self._resize_buffers["sr"] = buf
+        np.copyto(buf, output, casting="unsafe")
+        
+        return buf
+    
+    def enhance_image_ai(self, img: np.ndarray) -> List[np.ndarray]:
         """
         🚀 AI增强图像（精简版：只保留最有效的3种算法，提升速度）
         返回多个增强版本
+        
+        Args:
+            img: BGR格式的ndarray（PIL图像会先转换）
         """
-        enhanced_images = [img]  # 原图
+        img_cv = _to_bgr_array(img)
+        enhanced_images = [img_cv]  # 原图
         
         if not OPENCV_AVAILABLE:
             # 降级到基础增强
-            return self._enhance_image_basic(img)
+            return self._enhance_image_basic(Image.fromarray(img_cv[..., ::-1]))
         
         try:
-            # 转换为OpenCV格式
-            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-            # 🚀 使用SIMD优化的灰度转换
-            gray = self.fast_rgb_to_gray_simd(np.array(img))
-            
             # 🚀 直播间抢码专用：只保留2种最有效的算法（极速）
             
             # 1. 自适应二值化 - 对QR码识别最有效（最快最准）
-            binary = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            enhanced_images.append(Image.fromarray(binary))
+            binary = self._binarize_opencl(img_cv) if self.use_opencl else None
+            if binary is None:
+                # 🚀 灰度图写入内存池缓冲区（用完即归还）
+                gray_buf = image_buffer_pool.get_buffer(img_cv.shape[0], img_cv.shape[1], 1) if BUFFER_POOL_AVAILABLE else None
+                try:
+                    gray = self.fast_rgb_to_gray_simd(img_cv, None if gray_buf is None else gray_buf[..., 0], bgr=True)
+                    binary = cv2.adaptiveThreshold(
+                        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                        cv2.THRESH_BINARY, 11, 2
+                    )
+                finally:
+                    if gray_buf is not None:
+                        image_buffer_pool.return_buffer(gray_buf)
+            enhanced_images.append(binary)
             
             # 2. AI超分辨率（如果可用）- 处理直播间模糊画面
             if self.sr_net is not None:
-                sr_img = self.apply_super_resolution(img_cv)
-                sr_gray = cv2.cvtColor(sr_img, cv2.COLOR_BGR2GRAY)
-                enhanced_images.append(Image.fromarray(sr_gray))
+                sr_gray = self.apply_super_resolution(img_cv)
+                if sr_gray is not img_cv:  # 执行失败时返回原图，不重复加入
+                    enhanced_images.append(sr_gray)
             
         except Exception as e:
             print(f"[Warning] AI image enhancement failed: {e}")
-            # 降级到基础增强
-            return self._enhance_image_basic(img)
+            # 降级到基础增强（OpenCV可用，直接传BGR数组，无需转成PIL再转回来）
+            return self._enhance_image_basic(img_cv)
         
         return enhanced_images
     
-    def _enhance_image_basic(self, img: Image.Image) -> List[Image.Image]:
+    def _binarize_opencl(self, img: np.ndarray) -> Optional[np.ndarray]:
+        """
+        🚀 OpenCL流水线：灰度转换 + 自适应二值化（中间结果留在GPU）
+        
+        Returns:
+            二值化结果，OpenCL执行失败时返回 None（并停用OpenCL）
+        """
+        try:
+            umat = cv2.UMat(img)
+            gray = cv2.cvtColor(umat, cv2.COLOR_BGR2GRAY)
+            binary = cv2.adaptiveThreshold(
+                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                cv2.THRESH_BINARY, 11, 2
+            )
+            return binary.get()
+        except Exception as e:
+            print(f"[OpenCL] Pipeline failed, falling back to CPU: {e}")
+            self.use_opencl = False
+            return None
+    
+    @staticmethod
+    def _make_contrast_lut(factor: float) -> np.ndarray:
+        """以128为中心拉伸对比度的256项查找表"""
+        return np.clip((np.arange(256) - 128) * factor + 128, 0, 255).astype(np.uint8)
+    
+    def _enhance_image_basic(self, img) -> List:
         """
-        基础图像增强（不依赖OpenCV）
+        基础图像增强（有OpenCV时用LUT+filter2D，否则用PIL ImageEnhance）
+        
+        Args:
+            img: PIL图像；有OpenCV时也可以直接传BGR ndarray
         """
         enhanced_images = [img]  # 原图
         
         try:
+            if OPENCV_AVAILABLE:
+                # 🚀 只转换一次，之后都在ndarray上处理（结果为BGR ndarray）
+                arr = _to_bgr_array(img)
+                enhanced_images.append(cv2.LUT(arr, self._contrast_lut))           # 提高对比度
+                enhanced_images.append(cv2.filter2D(arr, -1, self._sharpen_kernel))  # 锐化
+                enhanced_images.append(cv2.filter2D(cv2.LUT(arr, self._contrast_lut_mild), -1, self._sharpen_kernel))  # 综合增强
+                return enhanced_images
+            
             # 提高对比度
             enhancer = ImageEnhance.Contrast(img)
             enhanced_images.append(enhancer.enhance(2.0))
@@ -365,66 +589,130 @@ class AIQRScanner:
         
         return enhanced_images
     
-    def try_decode_qr(self, img: Image.Image) -> Optional[str]:
+    def try_decode_qr(self, img) -> Optional[str]:
         """
         尝试解码单张图片的QR码
         🚀 优先使用微信QR码检测器（与MHY_Scanner相同），失败则fallback到pyzbar
+        
+        Args:
+            img: BGR或灰度ndarray（PIL图像会先转换）
         """
+        img = _to_bgr_array(img)
+        
         # 🚀 方案1：微信QR码检测器（与MHY_Scanner相同，性能更强）
         if self.wechat_detector is not None:
             try:
-                # 转换为OpenCV格式
-                img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                
-                # 使用微信检测器
-                res, points = self.wechat_detector.detectAndDecode(img_cv)
+                # 使用微信检测器（直接接受BGR/灰度ndarray）
+                res, points = self.wechat_detector.detectAndDecode(img)
                 
                 if res and len(res) > 0:
                     qr_data = res[0]
                     # 验证是否是鸣潮的二维码
-                    if "G152#KURO" in qr_data or "KURO" in qr_data:
+                    if KURO_TOKEN in qr_data:
                         return qr_data
             except Exception as e:
                 pass  # Fallback到pyzbar
         
-        # 🔄 方案2：Fallback到pyzbar（兼容性好）
+        # 🔄 方案2：Fallback到pyzbar（兼容性好，ndarray只读取单通道，需先转灰度）
         try:
-            decoded_objects = decode(img)
+            gray = img if img.ndim == 2 else self.fast_rgb_to_gray_simd(img, bgr=True)
+            # 直接传入 (原始字节, 宽, 高)，跳过pyzbar内部的图像类型判断和转换
+            decoded_objects = decode((gray.tobytes(), gray.shape[1], gray.shape[0]), symbols=_QR_SYMBOLS)
             if decoded_objects:
-                qr_data = decoded_objects[0].data.decode("utf-8")
-                # 验证是否是鸣潮的二维码
-                if "G152#KURO" in qr_data or "KURO" in qr_data:
-                    return qr_data
+                raw = decoded_objects[0].data
+                # 验证是否是鸣潮的二维码（"G152#KURO" 也包含 "KURO"，直接在字节上检查，不是则无需解码）
+                if KURO_TOKEN_BYTES in raw:
+                    return raw.decode("utf-8")
         except Exception:
             pass
         return None
     
-    def try_decode_parallel(self, images: List[Tuple[str, Image.Image]]) -> Optional[Tuple[str, str]]:
+    def resize_image(self, img: np.ndarray, width: int, height: int, slot: Optional[str] = None) -> np.ndarray:
         """
-        🚀 并行尝试解码多个图像候选（速度提升30-50%）
+        🚀 面积插值缩放（OpenCV SIMD实现，无OpenCV时使用PIL）
         
         Args:
-            images: List of (method_name, image) tuples
+            slot: 缓冲区用途名，指定时结果写入该用途的预分配缓冲区（下次同用途缩放会覆盖）
+        """
+        if OPENCV_AVAILABLE:
+            if slot is None:
+                return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+            shape = (height, width) + img.shape[2:]
+            buf = self._resize_buffers.get(slot)
+            if buf is None or buf.shape != shape:
+                buf = np.empty(shape, dtype=np.uint8)
+                self._resize_buffers[slot] = buf
+            return cv2.resize(img, (width, height), dst=buf, interpolation=cv2.INTER_AREA)
+        return np.asarray(Image.fromarray(img).resize((width, height), Image.Resampling.BOX))
+    
+    def downscale_for_decode(self, img: np.ndarray) -> Optional[np.ndarray]:
+        """
+        🚀 将大截图缩小到 FAST_DECODE_MAX_SIDE（面积平均插值）
         
         Returns:
-            (qr_code, method_name) if found, None otherwise
+            缩小后的图像，原图已足够小时返回 None
         """
-        futures = {}
+        height, width = img.shape[:2]
+        longest = max(width, height)
+        if longest <= FAST_DECODE_MAX_SIDE:
+            return None
+        scale = FAST_DECODE_MAX_SIDE / longest
+        return self.resize_image(img, int(width * scale), int(height * scale), slot="small")
+    
+    def detect_qr_box(self, img: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        🚀 用检测网络定位二维码（远比超分辨率便宜，用于跳过无码画面）
         
-        # 提交所有任务
-        for method_name, img in images:
-            future = self.parallel_executor.submit(self.try_decode_qr, img)
-            futures[future] = method_name
+        Returns:
+            二维码区域 (x0, y0, x1, y1)（已外扩边距）；没有可信候选时返回 None；
+            检测网络不可用或推理失败时返回整幅图像
+        """
+        height, width = img.shape[:2]
+        full = (0, 0, width, height)
+        if self.detect_net is None:
+            return full
         
-        # 等待第一个成功的结果
-        for future in as_completed(futures):
-            result = future.result()
+        try:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+            blob = cv2.dnn.blobFromImage(gray, 1.0 / 255, DETECT_INPUT_SIZE, (0, 0, 0), swapRB=False, crop=False)
+            self.detect_net.setInput(blob)
+            dets = self.detect_net.forward()  # [1, 1, N, 7]: id, label, conf, x0, y0, x1, y1（归一化坐标）
+            
+            scores = dets[0, 0, :, 2]
+            if scores.size == 0 or scores.max() < DETECT_CONFIDENCE:
+                return None
+            
+            x0, y0, x1, y1 = dets[0, 0, int(scores.argmax()), 3:7]
+            # 外扩15%边距，避免裁掉定位图案和静区
+            pad_x = (x1 - x0) * 0.15
+            pad_y = (y1 - y0) * 0.15
+            x0 = max(0, int((x0 - pad_x) * width))
+            y0 = max(0, int((y0 - pad_y) * height))
+            x1 = min(width, int((x1 + pad_x) * width))
+            y1 = min(height, int((y1 + pad_y) * height))
+            if x1 - x0 < 16 or y1 - y0 < 16:
+                return full
+            return x0, y0, x1, y1
+        except Exception as e:
+            print(f"[Warning] QR detection failed: {e}")
+            return full
+    
+    def try_decode_parallel(self, images: List[Tuple[str, np.ndarray]]) -> Optional[Tuple[str, str]]:
+        """
+        🚀 按顺序尝试解码多个图像候选，第一个成功即返回
+        
+        （解码器持有GIL且WeChat检测器非线程安全，串行比线程池并行更快）
+        
+        Args:
+            images: List of (method_name, image) tuples，按成功概率排序
+        
+        Returns:
+            (qr_code, method_name) if found, None otherwise
+        """
+        for method_name, img in images:
+            result = self.try_decode_qr(img)
             if result:
-                # 取消其他任务
-                for f in futures:
-                    if f != future:
-                        f.cancel()
-                return (result, futures[future])
+                return (result, method_name)
         
         return None
     
@@ -435,7 +723,7 @@ class AIQRScanner:
         集成优化：
         1. 性能监控
         2. 智能ROI预测
-        3. 并行多候选识别
+        3. 多候选顺序识别
         4. 内存池复用
         5. DXGI/BitBlt截图
         6. WeChat QR检测器
@@ -449,6 +737,23 @@ class AIQRScanner:
         Returns:
             二维码内容，如果没有检测到则返回 None
         """
+        img = self.grab_region(x, y, width, height)
+        if img is None:
+            return None
+        return self.decode_image(img, x, y, width, height)
+    
+    def stop_capture(self):
+        """停止后台截图（停止扫描时调用，释放GPU复制和截图线程）"""
+        if self.dxgi_screenshot:
+            self.dxgi_screenshot.stop_stream()
+    
+    def grab_region(self, x: int, y: int, width: int, height: int) -> Optional[np.ndarray]:
+        """
+        📸 截取指定区域（DXGI → BitBlt → PIL）
+        
+        Returns:
+            BGR格式的截图ndarray，失败时返回 None
+        """
         try:
             # 🚀 性能监控：开始计时
             if PERF_MONITOR_AVAILABLE:
@@ -456,74 +761,92 @@ class AIQRScanner:
             # 📸 截图阶段
             screenshot_method = "unknown"
             
+            img = None
+            
             # 🚀 优先级1：DXGI截图（GPU加速）
             if self.dxgi_screenshot:
                 try:
                     img = self.dxgi_screenshot.grab_region(x, y, width, height)
-                    if img is None:
-                        raise Exception("DXGI returned None")
                     screenshot_method = "DXGI"
                 except Exception:
-                    # DXGI失败，尝试BitBlt
-                    if self.fast_screenshot:
-                        try:
-                            img = self.fast_screenshot.grab_region(x, y, width, height)
-                            screenshot_method = "BitBlt"
-                        except Exception:
-                            # BitBlt也失败，回退到PIL
-                            x_scaled = int(x * self.scale_factor)
-                            y_scaled = int(y * self.scale_factor)
-                            width_scaled = int(width * self.scale_factor)
-                            height_scaled = int(height * self.scale_factor)
-                            img = ImageGrab.grab(bbox=(x_scaled, y_scaled, x_scaled + width_scaled, y_scaled + height_scaled))
-                            screenshot_method = "PIL"
-                    else:
-                        x_scaled = int(x * self.scale_factor)
-                        y_scaled = int(y * self.scale_factor)
-                        width_scaled = int(width * self.scale_factor)
-                        height_scaled = int(height * self.scale_factor)
-                        img = ImageGrab.grab(bbox=(x_scaled, y_scaled, x_scaled + width_scaled, y_scaled + height_scaled))
-                        screenshot_method = "PIL"
+                    img = None
+            
             # 🔄 优先级2：Windows BitBlt快速截图
-            elif self.fast_screenshot:
+            if img is None and self.fast_screenshot:
                 try:
                     img = self.fast_screenshot.grab_region(x, y, width, height)
                     screenshot_method = "BitBlt"
                 except Exception:
-                    x_scaled = int(x * self.scale_factor)
-                    y_scaled = int(y * self.scale_factor)
-                    width_scaled = int(width * self.scale_factor)
-                    height_scaled = int(height * self.scale_factor)
-                    img = ImageGrab.grab(bbox=(x_scaled, y_scaled, x_scaled + width_scaled, y_scaled + height_scaled))
-                    screenshot_method = "PIL"
-            # 🔄 优先级3：PIL截图
-            else:
-                x_scaled = int(x * self.scale_factor)
-                y_scaled = int(y * self.scale_factor)
-                width_scaled = int(width * self.scale_factor)
-                height_scaled = int(height * self.scale_factor)
-                img = ImageGrab.grab(bbox=(x_scaled, y_scaled, x_scaled + width_scaled, y_scaled + height_scaled))
+                    img = None
+            
+            # 🔄 优先级3：PIL截图（最后手段，最慢）
+            if img is None:
+                img = _to_bgr_array(ImageGrab.grab(bbox=self._pil_bbox(x, y, width, height)))
                 screenshot_method = "PIL"
             
             # 🚀 性能监控：截图完成
             if PERF_MONITOR_AVAILABLE:
-                perf_monitor.mark_screenshot_done(method=screenshot_method, image_size=(img.width, img.height))
+                perf_monitor.mark_screenshot_done(method=screenshot_method, image_size=(img.shape[1], img.shape[0]))
             
+            return img
+            
+        except Exception as e:
+            print(f"[Error] AI screenshot failed: {e}")
+            return None
+    
+    def _pil_bbox(self, x: int, y: int, width: int, height: int) -> Tuple[int, int, int, int]:
+        """将逻辑坐标换算为PIL截图使用的物理像素bbox（仅PIL降级路径需要）"""
+        scale = self.scale_factor
+        x_scaled = int(x * scale)
+        y_scaled = int(y * scale)
+        return x_scaled, y_scaled, x_scaled + int(width * scale), y_scaled + int(height * scale)
+    
+    def decode_image(self, img: np.ndarray, x: int, y: int, width: int, height: int) -> Optional[str]:
+        """
+        🔍 识别截图中的二维码（多候选 + AI增强）
+        
+        Args:
+            img: grab_region 返回的BGR截图
+            x, y, width, height: 截图对应的屏幕区域（用于ROI记录）
+            
+        Returns:
+            二维码内容，如果没有检测到则返回 None
+        """
+        try:
             # 🔍 QR检测阶段
             
-            # 🚀 准备多个候选图像（用于并行识别）
+            # 🚀 大区域先缩小识别一次（像素减少约4倍），失败再走全分辨率流程
+            img_small = self.downscale_for_decode(img)
+            if img_small is not None:
+                result = self.try_decode_qr(img_small)
+                if result:
+                    decoder = "WeChat" if self.wechat_detector else "pyzbar"
+                    
+                    # 🚀 性能监控：QR检测完成
+                    if PERF_MONITOR_AVAILABLE:
+                        perf_monitor.mark_qr_detect_done(method="downscaled", decoder=decoder)
+                    
+                    # 🚀 记录到ROI检测器
+                    if ROI_DETECTOR_AVAILABLE:
+                        smart_roi_detector.add_detection(x, y, width, height)
+                    
+                    print(f"[QR] ✓ Decoded using downscaled ({decoder})")
+                    return result
+            
+            # 🚀 准备多个候选图像（按成功概率排序）
+            img_height, img_width = img.shape[:2]
             target_width = 1280
             target_height = 720
-            width_ratio = target_width / img.width
-            height_ratio = target_height / img.height
+            width_ratio = target_width / img_width
+            height_ratio = target_height / img_height
             scale_ratio = min(width_ratio, height_ratio)
-            new_width = int(img.width * scale_ratio)
-            new_height = int(img.height * scale_ratio)
+            new_width = int(img_width * scale_ratio)
+            new_height = int(img_height * scale_ratio)
             
-            img_1280 = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            img_40 = img.resize((int(img.width * 0.4), int(img.height * 0.4)), Image.Resampling.LANCZOS)
+            img_1280 = self.resize_image(img, new_width, new_height, slot="1280")
+            img_40 = self.resize_image(img, int(img_width * 0.4), int(img_height * 0.4), slot="40")
             
-            # 🚀 并行识别多个候选（增加识别率）
+            # 🚀 依次识别多个候选（增加识别率）
             candidates = [
                 ("original", img),          # 原图（优先）
                 ("1280x720", img_1280),     # 标准尺寸
@@ -532,7 +855,7 @@ class AIQRScanner:
             
             # 🚀 调试：打印扫描信息
             if self.debug_mode:
-                print(f"[Scan] Trying {len(candidates)} candidates, size: {img.width}x{img.height}")
+                print(f"[Scan] Trying {len(candidates)} candidates, size: {img_width}x{img_height}")
             
             parallel_result = self.try_decode_parallel(candidates)
             
@@ -551,12 +874,21 @@ class AIQRScanner:
                 print(f"[QR] ✓ Decoded using {method} ({decoder})")
                 return qr_code
             
-            # 🚀 调试：如果并行识别失败，打印信息
+            # 🚀 调试：如果候选识别失败，打印信息
             if self.debug_mode:
                 print(f"[Scan] Parallel failed, trying enhanced...")
             
-            # 🚀 如果并行识别失败，尝试AI增强版本（提升识别率）
-            enhanced_images = self.enhance_image_ai(img_1280)
+            # 🚀 如果候选识别失败，先用检测网络判断画面中是否有二维码
+            box = self.detect_qr_box(img_1280)
+            if box is None:
+                # 没有可信候选，跳过增强和超分辨率
+                if self.debug_mode:
+                    print(f"[Scan] No QR candidate detected, skipping enhancement")
+                enhanced_images = []
+            else:
+                # 🚀 只对检测到的区域做AI增强（超分辨率输入远小于整幅图）
+                x0, y0, x1, y1 = box
+                enhanced_images = self.enhance_image_ai(img_1280[y0:y1, x0:x1])
             
             method_names = ["原图(已尝试)", "二值化", "AI超分辨率"]
             for idx, enhanced_img in enumerate(enhanced_images[1:], 1):
@@ -578,7 +910,7 @@ class AIQRScanner:
             
             # 🚀 调试：所有方法都失败
             if self.debug_mode:
-                print(f"[Scan] ✗ All methods failed for {img.width}x{img.height} image")
+                print(f"[Scan] ✗ All methods failed for {img_width}x{img_height} image")
             
             # 🚀 性能监控：未找到QR
             if PERF_MONITOR_AVAILABLE:
@@ -601,6 +933,7 @@ class AIQRScanner:
             img = ImageGrab.grabclipboard()
             if not isinstance(img, Image.Image):
                 return None
+            img = _to_bgr_array(img)
             
             # 多次尝试识别
             result = self.try_decode_qr(img)
@@ -2,16 +2,25 @@
 """
 配置管理器（持久化用户设置）
 """
+import atexit
 import json
 import os
+import threading
 from typing import Dict, Any
 
+# 可选：orjson（C实现的JSON序列化，比json.dump快约10倍）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class ConfigManager:
     """配置管理器（单例模式）"""
     
     _instance = None
     CONFIG_FILE = "config/settings.json"
+    SAVE_DELAY = 0.2  # 写盘防抖间隔（秒），期间的多次修改合并为一次写入
     
     def __new__(cls):
         if cls._instance is None:
@@ -26,7 +35,10 @@ class ConfigManager:
         
         self.config_dir = "config"
         self.config_file = self.CONFIG_FILE
+        self._lock = threading.Lock()
+        self._save_timer = None  # 待执行的防抖写盘
         self.config = self._load_config()
+        atexit.register(self.flush)
         self._initialized = True
     
     def _get_default_config(self) -> Dict[str, Any]:
@@ -40,6 +52,8 @@ class ConfigManager:
             "window_position": None,    # 窗口位置 [x, y]
             "scan_window_size": [800, 800],  # 扫描窗口大小
             "thread_pool_enabled": False,    # 是否启用多线程池
+            "speculative_scan_login": False, # 是否与roleInfos并发投机提交scanLogin
+            "dnn_threads": 0,                # OpenCV DNN线程数（0=自动，CPU核心数的一半）
             "version": "1.0"
         }
     
@@ -57,17 +71,14 @@ class ConfigManager:
         # 尝试加载配置文件
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    print("[Config] Loaded configuration successfully")
-                    
-                    # 合并默认配置（处理新增配置项）
-                    default_config = self._get_default_config()
-                    for key, value in default_config.items():
-                        if key not in config:
-                            config[key] = value
-                    
-                    return config
+                # 以二进制读取，直接交给解析器（省去一次文本解码）
+                with open(self.config_file, 'rb') as f:
+                    data = f.read()
+                config = orjson.loads(data) if orjson is not None else json.loads(data)
+                print("[Config] Loaded configuration successfully")
+                
+                # 合并默认配置（处理新增配置项，文件中的值优先）
+                return {**self._get_default_config(), **config}
             except Exception as e:
                 print(f"[Config] Failed to load config file: {e}")
                 return self._get_default_config()
@@ -79,41 +90,77 @@ class ConfigManager:
             return config
     
     def _save_config(self, config: Dict[str, Any] = None):
-        """保存配置到文件"""
+        """保存配置到文件（先写临时文件再替换，避免写到一半损坏配置）"""
         if config is None:
-            config = self.config
+            with self._lock:
+                config = dict(self.config)
         
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            if orjson is not None:
+                data = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(config, indent=4, ensure_ascii=False).encode('utf-8')
+            tmp_file = self.config_file + ".tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, self.config_file)
             # print("[Config] Configuration saved successfully")
         except Exception as e:
             print(f"[Config] Failed to save config: {e}")
     
+    def _schedule_save(self):
+        """延迟写盘（防抖）：SAVE_DELAY 内的多次修改只写一次"""
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+            self._save_timer.start()
+    
+    def flush(self):
+        """立即写入待保存的配置"""
+        with self._lock:
+            timer = self._save_timer
+            self._save_timer = None
+        if timer is None:
+            return
+        timer.cancel()
+        self._save_config()
+    
     def get(self, key: str, default=None) -> Any:
         """获取配置项"""
         return self.config.get(key, default)
     
     def set(self, key: str, value: Any, save: bool = True):
-        """设置配置项"""
-        self.config[key] = value
+        """设置配置项（值未变化时不写盘）"""
+        if key in self.config and self.config[key] == value:
+            return
+        with self._lock:
+            self.config[key] = value
         if save:
-            self._save_config()
+            self._schedule_save()
     
     def get_all(self) -> Dict[str, Any]:
         """获取所有配置"""
         return self.config.copy()
     
     def update(self, updates: Dict[str, Any], save: bool = True):
-        """批量更新配置"""
-        self.config.update(updates)
+        """批量更新配置（值未变化时不写盘）"""
+        changed = {
+            key: value for key, value in updates.items()
+            if key not in self.config or self.config[key] != value
+        }
+        if not changed:
+            return
+        with self._lock:
+            self.config.update(changed)
         if save:
-            self._save_config()
+            self._schedule_save()
     
     def reset(self):
         """重置为默认配置"""
-        self.config = self._get_default_config()
-        self._save_config()
+        with self._lock:
+            self.config = self._get_default_config()
+        self._schedule_save()
         print("[Config] Configuration reset to defaults")
 
 
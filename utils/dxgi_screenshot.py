@@ -3,8 +3,8 @@
 DXGI快速截图（GPU加速，与MHY_Scanner相同技术）
 使用dxcam库（纯DXGI实现，比BitBlt更快）
 """
-from PIL import Image
 import numpy as np
+import threading
 from typing import Optional
 
 # 尝试导入dxcam（DXGI截图，最快）
@@ -15,6 +15,13 @@ except ImportError:
     DXCAM_AVAILABLE = False
     print("[DXGI] dxcam not installed, install with: pip install dxcam")
 
+# 尝试导入OpenCV（BGRA→BGR转换使用SIMD实现）
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
 # 尝试导入mss（跨平台截图，次选）
 try:
     import mss
@@ -26,16 +33,23 @@ except ImportError:
 class DXGIScreenshot:
     """DXGI快速截图工具（GPU加速，与MHY_Scanner相同）"""
     
+    STREAM_FPS = 60  # 后台连续截图的帧率上限
+    
     def __init__(self):
         """初始化DXGI截图工具"""
         self.camera = None
         self.mss_instance = None
+        self._mss_local = threading.local()  # mss句柄按线程缓存（Windows下不能跨线程使用）
+        self._last_region = None  # 上一次dxcam截图的区域
+        self._last_img = None  # 上一次dxcam截图结果
+        self._stream_region = None  # 后台连续截图的区域（None 表示未在运行）
+        self._stream_failed = False  # 后台截图启动失败后退回逐帧grab
         self.method = "none"
         
         # 🚀 优先使用dxcam（纯DXGI，与MHY_Scanner相同技术）
         if DXCAM_AVAILABLE:
             try:
-                self.camera = dxcam.create()
+                self.camera = dxcam.create(output_color="BGR")  # 直接输出BGR，供OpenCV使用
                 if self.camera:
                     self.method = "dxcam"
                     print("[DXGI] Using dxcam (GPU-accelerated, same as MHY_Scanner)")
@@ -55,7 +69,7 @@ class DXGIScreenshot:
         
         print("[DXGI] No DXGI library available, will use fallback")
     
-    def grab_region(self, x: int, y: int, width: int, height: int) -> Optional[Image.Image]:
+    def grab_region(self, x: int, y: int, width: int, height: int) -> Optional[np.ndarray]:
         """
         🚀 使用DXGI截取屏幕区域（GPU加速，极速）
         
@@ -66,7 +80,7 @@ class DXGIScreenshot:
             height: 区域高度
         
         Returns:
-            PIL.Image: 截图对象
+            np.ndarray: BGR格式的截图 (H, W, 3)
         """
         if self.method == "dxcam" and self.camera:
             return self._grab_with_dxcam(x, y, width, height)
@@ -75,49 +89,95 @@ class DXGIScreenshot:
         else:
             return None
     
-    def _grab_with_dxcam(self, x: int, y: int, width: int, height: int) -> Optional[Image.Image]:
+    def _grab_with_dxcam(self, x: int, y: int, width: int, height: int) -> Optional[np.ndarray]:
         """使用dxcam截图（DXGI，最快）"""
         try:
-            # dxcam返回numpy数组（BGR格式）
+            # dxcam返回numpy数组（创建时已指定BGR格式）
             region = (x, y, x + width, y + height)
+            
+            # 🚀 后台线程连续截图到dxcam的环形缓冲区，这里只取最新一帧（截图与识别流水线并行）
+            if not self._stream_failed:
+                if region != self._stream_region:
+                    self._start_stream(region)
+                if self._stream_region is not None:
+                    return self.camera.get_latest_frame()
+            
             frame = self.camera.grab(region=region)
             
             if frame is None:
+                # 🚀 画面没有新帧时dxcam返回None，同一区域直接复用上一帧（避免回退到慢速截图）
+                if region == self._last_region:
+                    return self._last_img
                 return None
             
-            # 转换为PIL Image（RGB格式）
-            # dxcam返回的是BGR格式，需要转换
-            img = Image.fromarray(frame[..., ::-1])  # BGR -> RGB
-            return img
+            self._last_region = region
+            self._last_img = frame
+            return frame
         except Exception as e:
             print(f"[DXGI] dxcam grab failed: {e}")
             return None
     
-    def _grab_with_mss(self, x: int, y: int, width: int, height: int) -> Optional[Image.Image]:
+    def _start_stream(self, region):
+        """启动（或按新区域重启）dxcam后台截图线程"""
+        self.stop_stream()
+        try:
+            # video_mode：画面无变化时重复上一帧，get_latest_frame 不会一直等待新帧
+            self.camera.start(region=region, target_fps=self.STREAM_FPS, video_mode=True)
+            self._stream_region = region
+        except Exception as e:
+            print(f"[DXGI] dxcam stream failed, using single grabs: {e}")
+            self._stream_failed = True
+    
+    def stop_stream(self):
+        """停止后台截图线程（需在调用grab_region的线程中调用）"""
+        if self._stream_region is None:
+            return
+        self._stream_region = None
+        try:
+            self.camera.stop()
+        except Exception:
+            pass
+    
+    def _grab_with_mss(self, x: int, y: int, width: int, height: int) -> Optional[np.ndarray]:
         """使用mss截图（跨平台备选）"""
         try:
-            # mss的monitor格式
-            monitor = {
-                "top": y,
-                "left": x,
-                "width": width,
-                "height": height
-            }
+            # mss的monitor格式（每个线程复用一个dict，只更新坐标）
+            monitor = getattr(self._mss_local, "monitor", None)
+            if monitor is None:
+                monitor = self._mss_local.monitor = {}
+            monitor["top"] = y
+            monitor["left"] = x
+            monitor["width"] = width
+            monitor["height"] = height
             
-            # 截图
-            sct = self.mss_instance.grab(monitor)
+            # 截图（使用当前线程的mss实例，首次使用时创建）
+            sct = self._get_mss().grab(monitor)
             
-            # 转换为PIL Image
-            img = Image.frombytes("RGB", sct.size, sct.bgra, "raw", "BGRX")
-            return img
+            # BGRA -> BGR（去掉alpha通道，保证内存连续）
+            bgra = np.frombuffer(sct.bgra, dtype=np.uint8).reshape(sct.height, sct.width, 4)
+            if OPENCV_AVAILABLE:
+                # 🚀 OpenCV的SIMD通道转换，单次遍历直接写出连续的BGR
+                return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR)
+            return np.ascontiguousarray(bgra[..., :3])
         except Exception as e:
             print(f"[DXGI] mss grab failed: {e}")
             return None
     
+    def _get_mss(self):
+        """获取当前线程的mss实例"""
+        if threading.current_thread() is threading.main_thread():
+            return self.mss_instance
+        instance = getattr(self._mss_local, "instance", None)
+        if instance is None:
+            instance = mss.mss()
+            self._mss_local.instance = instance
+        return instance
+    
     def __del__(self):
         """清理资源"""
         if self.camera:
             try:
+                self.stop_stream()
                 self.camera.release()
             except:
                 pass
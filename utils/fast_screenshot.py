@@ -3,6 +3,9 @@
 Windows BitBlt快速截图（参考MHY_Scanner）
 比PIL.ImageGrab快5-10倍
 """
+import ctypes
+import functools
+from ctypes import wintypes
 import numpy as np
 from PIL import Image
 import win32gui
@@ -10,6 +13,84 @@ import win32ui
 import win32con
 import win32api
 
+# 尝试导入OpenCV（BGRX→BGR转换使用SIMD实现）
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+
+# GetDIBits：把位图像素直接写入预分配的缓冲区（GetBitmapBits每次都会新建bytes对象）
+_gdi32 = ctypes.WinDLL("gdi32")
+_gdi32.GetDIBits.argtypes = [
+    wintypes.HDC, wintypes.HBITMAP, wintypes.UINT, wintypes.UINT,
+    ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT,
+]
+_gdi32.GetDIBits.restype = ctypes.c_int
+DIB_RGB_COLORS = 0
+
+# 每显示器DPI感知V2：BitBlt按真实像素截图，不被系统DPI虚拟化缩放
+# （Qt6创建QApplication时已设置，此时调用会失败并被忽略；单独使用本模块时生效）
+DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2 = -4
+try:
+    ctypes.windll.user32.SetProcessDpiAwarenessContext(ctypes.c_void_p(DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2))
+except Exception:
+    pass
+
+
+@functools.lru_cache(maxsize=1)
+def _scale_factor() -> float:
+    """获取主显示器DPI缩放比例（进程内只查询一次）"""
+    try:
+        hdc = win32gui.GetDC(0)
+        dpi = win32ui.CreateDCFromHandle(hdc).GetDeviceCaps(88)  # LOGPIXELSX
+        win32gui.ReleaseDC(0, hdc)
+        return dpi / 96.0  # 96 DPI = 100% 缩放
+    except Exception:
+        return 1.0
+
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [
+        ("biSize", wintypes.DWORD),
+        ("biWidth", wintypes.LONG),
+        ("biHeight", wintypes.LONG),
+        ("biPlanes", wintypes.WORD),
+        ("biBitCount", wintypes.WORD),
+        ("biCompression", wintypes.DWORD),
+        ("biSizeImage", wintypes.DWORD),
+        ("biXPelsPerMeter", wintypes.LONG),
+        ("biYPelsPerMeter", wintypes.LONG),
+        ("biClrUsed", wintypes.DWORD),
+        ("biClrImportant", wintypes.DWORD),
+    ]
+
+
+class BITMAPINFO(ctypes.Structure):
+    _fields_ = [("bmiHeader", BITMAPINFOHEADER), ("bmiColors", wintypes.DWORD * 3)]
+
+
+def _make_bitmap_info(width, height):
+    """32位自上而下的BGRX位图信息（高度取负表示首行在上）"""
+    bmi = BITMAPINFO()
+    bmi.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+    bmi.bmiHeader.biWidth = width
+    bmi.bmiHeader.biHeight = -height
+    bmi.bmiHeader.biPlanes = 1
+    bmi.bmiHeader.biBitCount = 32
+    bmi.bmiHeader.biCompression = 0  # BI_RGB
+    return bmi
+
+
+def _read_bitmap(dc, bitmap, buffer, bmi):
+    """将位图像素读入预分配的 (H, W, 4) 缓冲区"""
+    lines = _gdi32.GetDIBits(dc.GetSafeHdc(), bitmap.GetHandle(), 0, buffer.shape[0],
+                             buffer.ctypes.data, ctypes.addressof(bmi), DIB_RGB_COLORS)
+    if lines != buffer.shape[0]:
+        raise OSError("GetDIBits failed")
+    return buffer
+
 
 class FastScreenshot:
     """Windows BitBlt快速截图工具"""
@@ -21,7 +102,7 @@ class FastScreenshot:
         self.screen_height = win32api.GetSystemMetrics(win32con.SM_CYSCREEN)
         
         # 获取DPI缩放比例
-        self.scale_factor = self._get_scale_factor()
+        self.scale_factor = _scale_factor()
         
         # 实际物理尺寸
         self.physical_width = int(self.screen_width * self.scale_factor)
@@ -36,17 +117,15 @@ class FastScreenshot:
         self.saveBitMap = win32ui.CreateBitmap()
         self.saveBitMap.CreateCompatibleBitmap(self.mfcDC, self.physical_width, self.physical_height)
         self.saveDC.SelectObject(self.saveBitMap)
-    
-    def _get_scale_factor(self):
-        """获取屏幕DPI缩放比例"""
-        try:
-            # 获取主显示器的DPI缩放
-            hdc = win32gui.GetDC(0)
-            dpi = win32ui.CreateDCFromHandle(hdc).GetDeviceCaps(88)  # LOGPIXELSX
-            win32gui.ReleaseDC(0, hdc)
-            return dpi / 96.0  # 96 DPI = 100% 缩放
-        except:
-            return 1.0
+        self.screen_buffer = None  # 全屏像素缓冲区（首次全屏截图时分配）
+        self.screen_bmi = _make_bitmap_info(self.physical_width, self.physical_height)
+        
+        # 区域截图的位图和DC（按区域尺寸缓存，尺寸变化时才重新创建）
+        self.regionBitMap = None
+        self.regionDC = None
+        self.region_size = None
+        self.region_buffer = None  # 区域像素缓冲区 (H, W, 4)，与区域位图一起按尺寸复用
+        self.region_bmi = None
     
     def grab_screen(self):
         """
@@ -59,15 +138,16 @@ class FastScreenshot:
         self.saveDC.BitBlt((0, 0), (self.physical_width, self.physical_height),
                            self.mfcDC, (0, 0), win32con.SRCCOPY)
         
-        # 转换为numpy数组
-        bmpinfo = self.saveBitMap.GetInfo()
-        bmpstr = self.saveBitMap.GetBitmapBits(True)
+        # 读取像素到复用的缓冲区
+        if self.screen_buffer is None:
+            self.screen_buffer = np.empty((self.physical_height, self.physical_width, 4), dtype=np.uint8)
+        _read_bitmap(self.saveDC, self.saveBitMap, self.screen_buffer, self.screen_bmi)
         
         # 创建PIL图像
         img = Image.frombuffer(
             'RGB',
-            (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
-            bmpstr, 'raw', 'BGRX', 0, 1
+            (self.physical_width, self.physical_height),
+            self.screen_buffer, 'raw', 'BGRX', 0, 1
         )
         
         return img
@@ -83,7 +163,7 @@ class FastScreenshot:
             height: 区域高度
         
         Returns:
-            PIL.Image: 截图对象
+            np.ndarray: BGR格式的截图 (H, W, 3)
         """
         # 考虑DPI缩放
         x_scaled = int(x * self.scale_factor)
@@ -91,36 +171,44 @@ class FastScreenshot:
         width_scaled = int(width * self.scale_factor)
         height_scaled = int(height * self.scale_factor)
         
-        # 创建临时位图（仅限于区域大小）
-        saveBitMap = win32ui.CreateBitmap()
-        saveBitMap.CreateCompatibleBitmap(self.mfcDC, width_scaled, height_scaled)
-        saveDC = self.mfcDC.CreateCompatibleDC()
-        saveDC.SelectObject(saveBitMap)
+        # 🚀 复用区域位图（扫描框尺寸不变时不再每帧创建/销毁GDI对象）
+        if self.region_size != (width_scaled, height_scaled):
+            self._release_region()
+            self.regionBitMap = win32ui.CreateBitmap()
+            self.regionBitMap.CreateCompatibleBitmap(self.mfcDC, width_scaled, height_scaled)
+            self.regionDC = self.mfcDC.CreateCompatibleDC()
+            self.regionDC.SelectObject(self.regionBitMap)
+            self.region_buffer = np.empty((height_scaled, width_scaled, 4), dtype=np.uint8)
+            self.region_bmi = _make_bitmap_info(width_scaled, height_scaled)
+            self.region_size = (width_scaled, height_scaled)
         
         # BitBlt复制指定区域
-        saveDC.BitBlt((0, 0), (width_scaled, height_scaled),
-                      self.mfcDC, (x_scaled, y_scaled), win32con.SRCCOPY)
+        self.regionDC.BitBlt((0, 0), (width_scaled, height_scaled),
+                             self.mfcDC, (x_scaled, y_scaled), win32con.SRCCOPY)
         
-        # 转换为numpy数组
-        bmpinfo = saveBitMap.GetInfo()
-        bmpstr = saveBitMap.GetBitmapBits(True)
+        # 🚀 像素直接写入复用的缓冲区，再转换为独立的BGR数组（BGRX -> BGR）
+        frame = _read_bitmap(self.regionDC, self.regionBitMap, self.region_buffer, self.region_bmi)
         
-        # 创建PIL图像
-        img = Image.frombuffer(
-            'RGB',
-            (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
-            bmpstr, 'raw', 'BGRX', 0, 1
-        )
-        
-        # 清理临时对象
-        saveDC.DeleteDC()
-        saveBitMap.DeleteObject()
-        
-        return img
+        if OPENCV_AVAILABLE:
+            return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        return np.ascontiguousarray(frame[..., :3])
+    
+    def _release_region(self):
+        """释放缓存的区域位图和DC"""
+        if self.regionDC is not None:
+            self.regionDC.DeleteDC()
+            self.regionDC = None
+        if self.regionBitMap is not None:
+            self.regionBitMap.DeleteObject()
+            self.regionBitMap = None
+        self.region_buffer = None
+        self.region_bmi = None
+        self.region_size = None
     
     def __del__(self):
         """清理资源"""
         try:
+            self._release_region()
             self.saveBitMap.DeleteObject()
             self.saveDC.DeleteDC()
             self.mfcDC.DeleteDC()
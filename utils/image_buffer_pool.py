@@ -6,6 +6,17 @@ from typing import Optional
 import threading
 
 
+# Buffer dimensions are rounded up to this granularity so that nearby sizes
+# (e.g. a scan window resized by a few pixels) share the same size class
+SIZE_CLASS_ALIGN = 64
+
+
+def _size_class(height: int, width: int, channels: int) -> int:
+    """Capacity (in bytes) of the size class that fits an image of this shape"""
+    align = SIZE_CLASS_ALIGN
+    return (-(-height // align) * align) * (-(-width // align) * align) * channels
+
+
 class ImageBufferPool:
     """
     Memory pool for image buffers to avoid frequent allocation/deallocation
@@ -24,8 +35,9 @@ class ImageBufferPool:
             pool_size: Number of buffers to pre-allocate (default: 5)
         """
         self.pool_size = pool_size
-        self.buffers = {}  # {size: [buffer1, buffer2, ...]}
-        self.lock = threading.Lock()
+        self.buffers = {}  # Shared pool: {size class capacity: [flat buffer1, flat buffer2, ...]}
+        self.lock = threading.Lock()  # Guards the shared pool only
+        self._local = threading.local()  # Per-thread free lists (no locking on the hot path)
         
         # Pre-allocate common sizes
         common_sizes = [
@@ -36,16 +48,23 @@ class ImageBufferPool:
         ]
         
         for size in common_sizes:
-            self._allocate_buffers(size, 2)  # 2 buffers per size
+            self._allocate_buffers(_size_class(*size), 2)  # 2 buffers per size
     
-    def _allocate_buffers(self, size: tuple, count: int):
-        """Pre-allocate buffers for a specific size"""
-        if size not in self.buffers:
-            self.buffers[size] = []
+    def _allocate_buffers(self, capacity: int, count: int):
+        """Pre-allocate buffers for a specific size class"""
+        if capacity not in self.buffers:
+            self.buffers[capacity] = []
         
         for _ in range(count):
-            buffer = np.zeros(size, dtype=np.uint8)
-            self.buffers[size].append(buffer)
+            # np.empty: callers overwrite every byte, zero-filling would be wasted bandwidth
+            self.buffers[capacity].append(np.empty(capacity, dtype=np.uint8))
+    
+    def _local_buffers(self) -> dict:
+        """Free lists owned by the calling thread"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        return buffers
     
     def get_buffer(self, height: int, width: int, channels: int = 3) -> np.ndarray:
         """
@@ -57,18 +76,24 @@ class ImageBufferPool:
             channels: Number of channels (default: 3 for RGB)
         
         Returns:
-            numpy array buffer
+            numpy array buffer (contiguous view into a size-class buffer,
+            contents are uninitialized)
         """
-        size = (height, width, channels)
+        capacity = _size_class(height, width, channels)
         
-        with self.lock:
-            if size in self.buffers and self.buffers[size]:
-                # Reuse existing buffer
-                buffer = self.buffers[size].pop()
-                return buffer
-            else:
-                # Allocate new buffer
-                return np.zeros(size, dtype=np.uint8)
+        # Thread-local free list first, shared pool only on a miss
+        free = self._local_buffers().get(capacity)
+        base = free.pop() if free else None
+        if base is None:
+            with self.lock:
+                free = self.buffers.get(capacity)
+                base = free.pop() if free else None
+        
+        if base is None:
+            # Allocate new buffer
+            base = np.empty(capacity, dtype=np.uint8)
+        
+        return base[:height * width * channels].reshape(height, width, channels)
     
     def return_buffer(self, buffer: np.ndarray):
         """
@@ -77,17 +102,27 @@ class ImageBufferPool:
         Args:
             buffer: numpy array to return
         """
-        size = buffer.shape
+        # Views handed out by get_buffer point back to the flat size-class buffer
+        base = buffer.base if isinstance(buffer.base, np.ndarray) else buffer
+        if base.ndim != 1 or base.dtype != np.uint8:
+            return  # Not allocated by this pool
+        capacity = base.size
+        
+        # Keep it on the calling thread's free list; overflow goes to the shared pool
+        local_free = self._local_buffers().setdefault(capacity, [])
+        if len(local_free) < self.pool_size:
+            local_free.append(base)
+            return
         
         with self.lock:
-            if size not in self.buffers:
-                self.buffers[size] = []
+            if capacity not in self.buffers:
+                self.buffers[capacity] = []
             
-            # Only keep up to pool_size buffers per size
-            if len(self.buffers[size]) < self.pool_size:
+            # Only keep up to pool_size buffers per size class
+            if len(self.buffers[capacity]) < self.pool_size:
                 # Clear buffer before returning (optional, for security)
-                # buffer.fill(0)  # Uncomment if needed
-                self.buffers[size].append(buffer)
+                # base.fill(0)  # Uncomment if needed
+                self.buffers[capacity].append(base)
     
     def get_pil_image_efficient(self, height: int, width: int, data: bytes = None) -> Image.Image:
         """
@@ -112,12 +147,13 @@ class ImageBufferPool:
         return img
     
     def clear(self):
-        """Clear all buffers in pool"""
+        """Clear the shared pool and the calling thread's free lists"""
+        self._local_buffers().clear()
         with self.lock:
             self.buffers.clear()
     
     def get_stats(self) -> dict:
-        """Get pool statistics"""
+        """Get pool statistics (shared pool; per-thread free lists are not included)"""
         with self.lock:
             total_buffers = sum(len(buffers) for buffers in self.buffers.values())
             total_memory_mb = sum(
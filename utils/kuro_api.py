@@ -2,21 +2,46 @@
 """库街区 API 封装 - 终极网络优化版"""
 import requests
 import socket
+import ssl
+import sys
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Dict, Optional, Any
+from urllib.parse import urlencode
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from urllib3.util.connection import create_connection
 
-# 尝试导入 HTTP/2 支持
+# 尝试导入 HTTP/2 支持（httpx + h2）
 try:
-    from requests_http2 import HTTP2Adapter
+    import httpx
+    import h2  # noqa: F401  httpx的HTTP/2实现依赖h2
     HTTP2_AVAILABLE = True
 except ImportError:
     HTTP2_AVAILABLE = False
-    print("[Network] HTTP/2 not available (pip install requests-http2 for better performance)")
+    print("[Network] HTTP/2 not available (pip install httpx[http2] for better performance)")
 
-# 全局DNS缓存 - 避免重复DNS解析
-_DNS_CACHE = {}
+# 可选：orjson（C实现的JSON解析，直接解析响应字节，跳过字符集检测）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _parse_json(response) -> Dict[str, Any]:
+    """解析JSON响应（requests/httpx响应均可）"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+# HTTP/2 禁止连接级头部，br解压需要额外依赖，这些头部不发给httpx
+_H2_DROP_HEADERS = {"Connection"}
+_H2_OVERRIDE_HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+# 全局DNS缓存有效期（秒），过期后重新解析
+_DNS_TTL = 300
 
 # 🚀 使用更快的公共DNS服务器（阿里云/腾讯云/Google）
 _FAST_DNS_SERVERS = [
@@ -25,6 +50,68 @@ _FAST_DNS_SERVERS = [
     "8.8.8.8",        # Google DNS（海外）
 ]
 
+# 🚀 公共DNS解析器（模块加载时创建一次，未安装dnspython时为None）
+try:
+    import dns.resolver
+    _RESOLVER = dns.resolver.Resolver()
+    _RESOLVER.nameservers = _FAST_DNS_SERVERS
+    _RESOLVER.timeout = 0.5
+    _RESOLVER.lifetime = 1.0
+except Exception:
+    _RESOLVER = None
+
+
+def _resolve_host(host: str) -> str:
+    """
+    🚀 解析主机名（带TTL缓存：按 _DNS_TTL 划分时间段，同一时间段内直接命中缓存）
+    """
+    return _resolve_in_bucket(host, int(time.monotonic() // _DNS_TTL))
+
+
+@lru_cache(maxsize=128)
+def _resolve_in_bucket(host: str, ttl_bucket: int) -> str:
+    """
+    解析主机名：系统DNS → 快速公共DNS（ttl_bucket 仅作为缓存键，解析失败不会被缓存）
+    """
+    try:
+        # 优先使用系统DNS
+        ip = socket.gethostbyname(host)
+    except socket.gaierror:
+        if _RESOLVER is None:
+            raise
+        # 如果失败，使用快速公共DNS
+        ip = str(_RESOLVER.resolve(host, 'A')[0])
+    
+    return ip
+
+# Linux的TCP_FASTOPEN_CONNECT（socket模块未导出该常量）
+_TCP_FASTOPEN_CONNECT = getattr(socket, "TCP_FASTOPEN_CONNECT", 30)
+
+
+def _make_ssl_context() -> ssl.SSLContext:
+    """
+    🚀 全局共享的TLS上下文：只加载一次CA证书，禁用TLS 1.0/1.1
+    """
+    try:
+        import certifi
+        cafile = certifi.where()
+    except ImportError:
+        cafile = None
+    context = ssl.create_default_context(cafile=cafile)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    return context
+
+
+_SSL_CONTEXT = _make_ssl_context()
+
+
+class _TunedHTTPAdapter(HTTPAdapter):
+    """连接池使用共享的TLS上下文（新连接不再各自创建上下文、加载证书）"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("ssl_context", _SSL_CONTEXT)
+        super().init_poolmanager(*args, **kwargs)
+
 
 def patched_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None, socket_options=None):
     """
@@ -34,32 +121,12 @@ def patched_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, s
     3. TCP_QUICKACK（快速确认，减少延迟）
     4. SO_KEEPALIVE（保持连接活跃）
     5. 优化的 Socket 缓冲区
+    6. TCP Fast Open（Linux，首个数据包随SYN发出）
     """
     host, port = address
     
     # 🚀 智能DNS缓存（使用快速DNS服务器）
-    if host in _DNS_CACHE:
-        ip = _DNS_CACHE[host]
-    else:
-        # 尝试使用快速DNS服务器解析
-        try:
-            # 优先使用系统DNS
-            ip = socket.gethostbyname(host)
-        except socket.gaierror:
-            # 如果失败，尝试使用快速公共DNS
-            import dns.resolver
-            resolver = dns.resolver.Resolver()
-            resolver.nameservers = _FAST_DNS_SERVERS
-            resolver.timeout = 0.5
-            resolver.lifetime = 1.0
-            try:
-                answers = resolver.resolve(host, 'A')
-                ip = str(answers[0])
-            except Exception:
-                # 最后回退到系统DNS
-                ip = socket.gethostbyname(host)
-        
-        _DNS_CACHE[host] = ip
+    ip = _resolve_host(host)
     
     # 创建socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -85,6 +152,14 @@ def patched_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, s
     except (OSError, AttributeError):
         pass
     
+    # 5. TCP_FASTOPEN_CONNECT - TLS ClientHello随SYN发出，冷连接省一个RTT
+    #    （Linux 4.11+；Windows的TFO只支持ConnectEx，普通connect无效）
+    if sys.platform.startswith("linux"):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, _TCP_FASTOPEN_CONNECT, 1)
+        except OSError:
+            pass
+    
     # 设置超时
     if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
         sock.settimeout(timeout)
@@ -99,6 +174,15 @@ def patched_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, s
 import urllib3.util.connection
 urllib3.util.connection.create_connection = patched_create_connection
 
+# 🚀 对冲请求线程池（roleInfos慢时提前补发请求，取最先返回的结果）
+_hedge_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="kuro-hedge")
+
+# 🚀 HTTP/1.1下预热的并发连接数（与对冲请求的最大并发数一致，补发时都有现成连接）
+_WARM_CONNECTIONS = 3
+
+# 🚀 连接预热线程池（与对冲请求分开，预热中的HEAD不会占住对冲请求的线程）
+_warm_executor = ThreadPoolExecutor(max_workers=_WARM_CONNECTIONS, thread_name_prefix="kuro-warm")
+
 
 class KuroAPI:
     """库街区 API 接口封装 - 极速优化版（多人抢码专用）"""
@@ -109,45 +193,34 @@ class KuroAPI:
         # 创建终极优化的 Session
         self.session = requests.Session()
         
-        # 🚀 尝试使用 HTTP/2 适配器（连接复用，头部压缩，多路复用）
-        if HTTP2_AVAILABLE:
-            try:
-                adapter = HTTP2Adapter(
-                    pool_connections=50,
-                    pool_maxsize=200,
-                    max_retries=0,
-                    pool_block=False
-                )
-                self.session.mount('https://', adapter)
-                print("[Network] ✓ HTTP/2 enabled (faster multiplexing)")
-            except Exception as e:
-                print(f"[Network] HTTP/2 init failed, fallback to HTTP/1.1: {e}")
-                # Fallback to HTTP/1.1
-                adapter = HTTPAdapter(
-                    pool_connections=30,
-                    pool_maxsize=100,
-                    max_retries=Retry(total=0, backoff_factor=0, status_forcelist=[]),
-                    pool_block=False
-                )
-                self.session.mount('https://', adapter)
-        else:
-            # 🚀 HTTP/1.1 极速连接池配置
-            adapter = HTTPAdapter(
+        # 🚀 HTTP/1.1 极速连接池配置（HTTP 也使用相同配置）
+        for prefix in ('https://', 'http://'):
+            adapter = _TunedHTTPAdapter(
                 pool_connections=30,
                 pool_maxsize=100,
                 max_retries=Retry(total=0, backoff_factor=0, status_forcelist=[]),
                 pool_block=False
             )
-            self.session.mount('https://', adapter)
+            self.session.mount(prefix, adapter)
         
-        # HTTP 也使用相同配置
-        http_adapter = HTTPAdapter(
-            pool_connections=30,
-            pool_maxsize=100,
-            max_retries=Retry(total=0, backoff_factor=0, status_forcelist=[]),
-            pool_block=False
-        )
-        self.session.mount('http://', http_adapter)
+        # 🚀 抢码接口优先使用 HTTP/2（单连接多路复用，头部压缩）
+        self.h2_client = None
+        if HTTP2_AVAILABLE:
+            try:
+                transport = httpx.HTTPTransport(
+                    http2=True,
+                    verify=_SSL_CONTEXT,
+                    retries=0,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                    socket_options=[
+                        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                    ],
+                )
+                self.h2_client = httpx.Client(transport=transport)
+                print("[Network] ✓ HTTP/2 enabled (faster multiplexing)")
+            except Exception as e:
+                print(f"[Network] HTTP/2 init failed, fallback to HTTP/1.1: {e}")
         
         # 🚀 终极优化的 headers（减少传输大小，启用压缩）
         self.headers = {
@@ -165,20 +238,25 @@ class KuroAPI:
         }
         self.token = ""
         self._connection_warmed = False  # 连接预热标志
+        self._warm_futures = []  # 进行中的预热请求（避免重复点击时重复发出）
+        self._prepared = {}  # 🚀 预构建的请求模板 {接口路径: PreparedRequest}（headers变化时清空）
         
         # 🚀 预解析DNS（启动时立即解析，避免首次请求延迟）
         self._pre_resolve_dns()
     
     def _pre_resolve_dns(self):
         """
-        🚀 预解析DNS（启动时立即解析，避免首次请求延迟）
+        🚀 预解析DNS并预热连接池（启动时在后台完成，首次请求复用已建立的TCP+TLS连接）
         """
         try:
             import threading
             def resolve():
                 try:
                     host = self.BASE_URL.replace("https://", "").replace("http://", "")
-                    socket.gethostbyname(host)
+                    _resolve_host(host)  # 写入DNS缓存，首次请求直接命中
+                    # 紧接着建立keep-alive连接放回连接池（连接池线程安全，可与正式请求并发）
+                    (self.h2_client or self.session).head(self.BASE_URL, timeout=1.0, headers={"User-Agent": self.headers["User-Agent"]})
+                    self._connection_warmed = True
                 except Exception:
                     pass
             # 异步解析，不阻塞启动
@@ -197,7 +275,7 @@ class KuroAPI:
             import time
             start = time.perf_counter()
             # 使用 HEAD 请求测量延迟（最小开销）
-            response = self.session.head(self.BASE_URL, timeout=2)
+            response = (self.h2_client or self.session).head(self.BASE_URL, timeout=2)
             latency = (time.perf_counter() - start) * 1000
             return latency
         except Exception:
@@ -207,6 +285,7 @@ class KuroAPI:
         """设置认证 token"""
         self.token = token
         self.headers["token"] = token
+        self._prepared.clear()  # headers已变化，请求模板需要重建
         # 设置token后立即预热连接
         if not self._connection_warmed:
             self.warm_up_connection()
@@ -214,15 +293,70 @@ class KuroAPI:
     def warm_up_connection(self):
         """
         🚀 预热网络连接（在扫码前调用，提前建立TCP+TLS连接，节省100-300ms）
+        
+        已预热时直接返回；HEAD请求在后台线程池发出，不等待结果，不阻塞调用方（GUI线程）
         """
+        if self._connection_warmed or any(not f.done() for f in self._warm_futures):
+            return
         try:
             # 发送一个轻量级的HEAD请求来建立连接
             url = f"{self.BASE_URL}/user/role/roleInfos"
-            self.session.head(url, timeout=0.3, headers=self.headers)
-            self._connection_warmed = True
+            if self.h2_client is not None:
+                # HTTP/2单连接多路复用，一个连接就够
+                futures = [_warm_executor.submit(self.h2_client.head, url, timeout=0.3, headers=self._h2_headers())]
+            else:
+                # HTTP/1.1每个连接同时只能处理一个请求：并发发出多个HEAD，让连接池里留下多个热连接
+                futures = [
+                    _warm_executor.submit(self.session.head, url, timeout=0.3, headers=self.headers)
+                    for _ in range(_WARM_CONNECTIONS)
+                ]
+            self._warm_futures = futures
+            for future in futures:
+                future.add_done_callback(self._on_warm_up_done)
         except Exception:
             pass  # 预热失败不影响正常功能
     
+    def _on_warm_up_done(self, future):
+        """预热请求完成回调：任一HEAD成功即标记连接已预热"""
+        if not future.cancelled() and future.exception() is None:
+            self._connection_warmed = True
+    
+    def _h2_headers(self) -> Dict[str, str]:
+        """HTTP/2请求使用的headers（去掉连接级头部）"""
+        headers = {k: v for k, v in self.headers.items() if k not in _H2_DROP_HEADERS}
+        headers.update(_H2_OVERRIDE_HEADERS)
+        return headers
+    
+    def _post_form(self, path: str, data: Dict[str, str], timeout: float) -> requests.Response:
+        """
+        🚀 发送表单POST：HTTP/2可用时走httpx；否则使用预构建的请求模板
+        （只替换请求体，跳过headers合并和请求构建流程）
+        """
+        if self.h2_client is not None:
+            try:
+                return self.h2_client.post(f"{self.BASE_URL}{path}", content=urlencode(data).encode("utf-8"),
+                                           headers=self._h2_headers(), timeout=timeout)
+            except httpx.TimeoutException as e:
+                # 统一为requests的超时异常，调用方的阶梯重试逻辑不变
+                raise requests.exceptions.Timeout(str(e)) from e
+        
+        template = self._prepared.get(path)
+        if template is None:
+            template = self.session.prepare_request(
+                requests.Request("POST", f"{self.BASE_URL}{path}", headers=self.headers)
+            )
+            # Cookie会随服务器响应变化，不放进模板，每次发送前按当前session.cookies生成
+            template.headers.pop("Cookie", None)
+            self._prepared[path] = template
+        
+        # 复制模板（可能有并发请求），只写入本次的请求体和Cookie
+        prepared = template.copy()
+        prepared.prepare_cookies(self.session.cookies)
+        body = urlencode(data).encode("utf-8")
+        prepared.body = body
+        prepared.headers["Content-Length"] = str(len(body))
+        return self.session.send(prepared, timeout=timeout)
+    
     def login(self, mobile: str, code: str) -> Dict[str, Any]:
         """
         使用手机号和验证码登录
@@ -235,14 +369,15 @@ class KuroAPI:
             登录结果字典
         """
         url = f"{self.BASE_URL}/user/sdkLogin"
-        data = {
+        # 直接传入编码好的表单字节，requests无需再走表单编码
+        data = urlencode({
             "mobile": mobile,
             "code": code
-        }
+        }).encode("utf-8")
         
         try:
             response = self.session.post(url, data=data, headers=self.headers, timeout=5)
-            result = response.json()
+            result = _parse_json(response)
             
             if result.get("code") == 200:
                 data = result.get("data", {})
@@ -263,24 +398,61 @@ class KuroAPI:
         Returns:
             角色信息字典
         """
-        url = f"{self.BASE_URL}/user/auth/roleInfos"
         data = {"qrCode": qr_code}
         
-        # 🚀 平衡的阶梯式重试：0.6s -> 1.2s -> 2.0s（稳定性优先）
-        timeouts = [0.6, 1.2, 2.0] if smart_retry else [1.0]
-        
-        last_error = None
-        for attempt, timeout in enumerate(timeouts, 1):
+        if not smart_retry:
             try:
-                response = self.session.post(url, data=data, headers=self.headers, timeout=timeout)
-                return response.json()
+                return _parse_json(self._post_form("/user/auth/roleInfos", data, 1.0))
             except requests.exceptions.Timeout:
-                last_error = f"请求超时(>{timeout}s)"
-                if attempt < len(timeouts):
-                    continue  # Try next timeout
+                return {"code": -1, "msg": "请求超时(>1.0s)"}
             except Exception as e:
-                last_error = f"请求失败: {str(e)}"
-                break  # Don't retry on non-timeout errors
+                return {"code": -1, "msg": f"请求失败: {str(e)}"}
+        
+        # 🚀 对冲请求：0s发出第1个，300ms未返回补发第2个，900ms补发第3个，取最先成功的结果
+        # （roleInfos只读，重复请求无副作用；服务器正常时只会发出1个请求）
+        return self._hedged_post("/user/auth/roleInfos", data, delays=(0.0, 0.3, 0.9), timeout=2.0)
+    
+    def _hedged_post(self, path: str, data: Dict[str, str], delays, timeout: float) -> Dict[str, Any]:
+        """
+        🚀 按 delays 依次补发同一请求，返回最先成功的响应（只用于幂等接口）
+        """
+        def send():
+            return _parse_json(self._post_form(path, data, timeout))
+        
+        start = time.monotonic()
+        pending = set()
+        last_error = None
+        
+        def collect(done):
+            """处理已完成的请求，返回成功结果（都失败时返回 None）"""
+            nonlocal last_error
+            for future in done:
+                try:
+                    return future.result()
+                except requests.exceptions.Timeout:
+                    last_error = f"请求超时(>{timeout}s)"
+                except Exception as e:
+                    last_error = f"请求失败: {str(e)}"
+            return None
+        
+        for delay in delays:
+            if pending:
+                # 等到下一次补发时间；期间有请求完成就不再补发
+                remaining = start + delay - time.monotonic()
+                done, pending = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+                result = collect(done)
+                if result is not None:
+                    return result
+                if last_error and not last_error.startswith("请求超时"):
+                    break  # 非超时错误（如连接失败）不再补发
+            pending.add(_hedge_executor.submit(send))
+        
+        # 等待剩余请求，取第一个成功的
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            result = collect(done)
+            if result is not None:
+                return result
         
         return {"code": -1, "msg": last_error or "请求失败"}
     
@@ -297,7 +469,6 @@ class KuroAPI:
         Returns:
             登录结果字典
         """
-        url = f"{self.BASE_URL}/user/auth/scanLogin"
         data = {
             "autoLogin": "true" if auto_login else "false",
             "qrCode": qr_code,
@@ -311,8 +482,8 @@ class KuroAPI:
         last_error = None
         for attempt, timeout in enumerate(timeouts, 1):
             try:
-                response = self.session.post(url, data=data, headers=self.headers, timeout=timeout)
-                return response.json()
+                response = self._post_form("/user/auth/scanLogin", data, timeout)
+                return _parse_json(response)
             except requests.exceptions.Timeout:
                 last_error = f"请求超时(>{timeout}s)"
                 if attempt < len(timeouts):
@@ -331,11 +502,11 @@ class KuroAPI:
             发送结果字典
         """
         url = f"{self.BASE_URL}/user/sms/scanSms"
-        data = "geeTestData="
+        data = b"geeTestData="
         
         try:
             response = self.session.post(url, data=data, headers=self.headers, timeout=5)
-            result = response.json()
+            result = _parse_json(response)
             return result
         except Exception as e:
             return {"code": -1, "msg": f"请求失败: {str(e)}"}
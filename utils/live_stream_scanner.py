@@ -4,11 +4,33 @@
 使用OpenCV读取直播流，无需额外安装FFmpeg
 """
 import cv2
+import numpy as np
+import os
 import re
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
 from typing import Optional, Callable
 from PySide6.QtCore import QThread, Signal
-import time
+from utils.smart_roi_detector import SmartROIDetector
+
+# pyzbar只用于识别成功后定位二维码（给ROI预测提供位置）
+try:
+    from pyzbar.pyzbar import decode as zbar_decode, ZBarSymbol
+    PYZBAR_AVAILABLE = True
+except Exception:
+    PYZBAR_AVAILABLE = False
+
+# 🚀 FFmpeg低延迟选项（打开流时读取）：不缓冲输入，低延迟解码
+_FFMPEG_LOW_DELAY_OPTIONS = "fflags;nobuffer|flags;low_delay"
+
+# 🚀 扫描前把帧缩小到最长边不超过此值（720p），1080p/4K直播画面的解码耗时随像素数线性增长
+LIVE_SCAN_MAX_SIDE = 1280
+
+# 🚀 B站直播流地址缓存（房间号 -> (流地址, 获取时间)），短时间内重新进入同一直播间无需再请求API
+_STREAM_URL_CACHE_TTL = 60  # 秒（流地址带签名，有效期远长于此）
+_stream_url_cache = {}
 
 
 class LiveStreamScanner(QThread):
@@ -25,6 +47,33 @@ class LiveStreamScanner(QThread):
         self.is_running = False
         self.cap = None
         self.platform = "bilibili"  # bilibili, douyin, huya
+        
+        # 🚀 截帧线程与扫描线程之间的单帧槽（只保留最新一帧，旧帧自动丢弃）
+        self._lock = threading.Lock()
+        self._latest = None
+        self._frame_ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._stream_ended = False
+        self._capture_thread = None
+        self._scanner = None  # QR扫描器（每次运行时解析一次）
+        self._frame_skip = 5  # 每隔多少帧解码一帧（按实际扫描耗时自适应调整）
+        
+        # 🚀 跨帧复用的缩放/灰度输出缓冲区（帧尺寸不变时不再逐帧分配）
+        self._resize_buf = None
+        self._gray_buf = None
+        
+        # 🚀 二维码位置预测（帧坐标系，与屏幕扫描的全局ROI检测器分开）
+        self._roi_detector = SmartROIDetector(history_size=5, confidence_threshold=3)
+        
+        # 🚀 复用HTTP连接（keep-alive），第二次API请求无需重新TCP+TLS握手
+        self._session = requests.Session()
+        self._session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+        })
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
     
     def set_stream_url(self, url: str, platform: str = "bilibili"):
         """
@@ -47,10 +96,14 @@ class LiveStreamScanner(QThread):
         Returns:
             直播流URL，失败返回None
         """
+        cached_url, cached_at = _stream_url_cache.get(room_id, (None, 0.0))
+        if cached_url and time.monotonic() - cached_at < _STREAM_URL_CACHE_TTL:
+            return cached_url
+        
         try:
             # 获取房间信息
             api_url = f"https://api.live.bilibili.com/room/v1/Room/get_info?room_id={room_id}"
-            response = requests.get(api_url, timeout=5)
+            response = self._session.get(api_url, timeout=5)
             data = response.json()
             
             if data.get("code") != 0:
@@ -78,7 +131,7 @@ class LiveStreamScanner(QThread):
                 "ptype": 8
             }
             
-            response = requests.get(stream_api, params=params, timeout=5)
+            response = self._session.get(stream_api, params=params, timeout=5)
             data = response.json()
             
             # 解析流地址
@@ -91,6 +144,7 @@ class LiveStreamScanner(QThread):
                                 base_url = codec["url_info"][0]["host"]
                                 extra = codec["url_info"][0]["extra"]
                                 url = f"{base_url}{codec['base_url']}{extra}"
+                                _stream_url_cache[room_id] = (url, time.monotonic())
                                 return url
             
             self.error_occurred.emit("无法获取直播流地址")
@@ -136,7 +190,10 @@ class LiveStreamScanner(QThread):
         
         # 打开视频流
         try:
-            self.cap = cv2.VideoCapture(stream_url)
+            os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", _FFMPEG_LOW_DELAY_OPTIONS)
+            self.cap = cv2.VideoCapture(stream_url, cv2.CAP_FFMPEG)
+            # 🚀 只缓冲1帧：始终处理最新画面，而不是排队中的旧帧
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             
             if not self.cap.isOpened():
                 self.error_occurred.emit("无法打开直播流")
@@ -145,43 +202,56 @@ class LiveStreamScanner(QThread):
             
             self.status_changed.emit("已连接直播流，开始扫描...")
             
-            # 导入QR扫描器
-            try:
-                from utils.ai_qr_scanner import ai_qr_scanner
-                scanner = ai_qr_scanner
-            except:
-                from utils.qr_scanner import qr_scanner
-                scanner = qr_scanner
+            # 导入QR扫描器（循环外解析一次，扫描时直接使用）
+            self._scanner = self._resolve_scanner()
             
-            frame_count = 0
             last_ticket = ""
+            self._roi_detector.reset()
+            
+            # 🚀 独立线程持续读流，扫描线程只取最新一帧（扫描慢时不会积压旧帧）
+            self._latest = None
+            self._frame_ready.clear()
+            self._stop_event.clear()
+            self._stream_ended = False
+            self._frame_skip = 5
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            if not fps or fps <= 0 or fps > 240:
+                fps = 30.0  # 直播流常不报告帧率
+            self._capture_thread = threading.Thread(target=self._capture_loop, name="live-capture", daemon=True)
+            self._capture_thread.start()
             
             while self.is_running:
-                ret, frame = self.cap.read()
-                
-                if not ret:
-                    self.error_occurred.emit("直播流中断")
-                    break
-                
-                frame_count += 1
+                # 超时也要往下检查：结束信号可能在上一帧扫描期间就已到达（已被clear掉）
+                self._frame_ready.wait(0.5)
+                with self._lock:
+                    frame = self._latest
+                    self._latest = None
+                    self._frame_ready.clear()
                 
-                # 每5帧扫描一次（降低CPU占用）
-                if frame_count % 5 != 0:
+                if frame is None:
+                    if self._stream_ended:
+                        self.error_occurred.emit("直播流中断")
+                        break
                     continue
                 
                 try:
-                    # 转换为PIL Image
-                    from PIL import Image
-                    import numpy as np
+                    # 🚀 高分辨率帧先缩小到720p（面积插值，QR码边缘不失真）
+                    h, w = frame.shape[:2]
+                    longest = max(h, w)
+                    if longest > LIVE_SCAN_MAX_SIDE:
+                        scale = LIVE_SCAN_MAX_SIDE / longest
+                        h, w = int(h * scale), int(w * scale)
+                        self._resize_buf = self._ensure_buffer(self._resize_buf, (h, w, frame.shape[2]))
+                        frame = cv2.resize(frame, (w, h), dst=self._resize_buf, interpolation=cv2.INTER_AREA)
                     
-                    # BGR转RGB
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(rgb_frame)
+                    # 🚀 直接转灰度交给解码器（扫描器接受ndarray，无需BGR→RGB→PIL再转回灰度）
+                    self._gray_buf = self._ensure_buffer(self._gray_buf, (h, w))
+                    started = time.perf_counter()
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+                    qr_code = self._scan_frame_with_roi(gray)
                     
-                    # 尝试识别QR码
-                    # 注意：这里需要修改scanner接口以支持PIL Image
-                    # 暂时使用简化方法
-                    qr_code = self._scan_frame(pil_image)
+                    # 🚀 扫描期间到达的帧不必解码：按本次耗时决定截帧线程跳过多少帧
+                    self._frame_skip = max(1, int((time.perf_counter() - started) * fps))
                     
                     if qr_code:
                         # 去重检查
@@ -195,22 +265,102 @@ class LiveStreamScanner(QThread):
                 except Exception as e:
                     print(f"[LiveStream] Frame scan error: {e}")
                     continue
-                
-                # 控制扫描速度
-                time.sleep(0.05)  # 50ms间隔
             
         except Exception as e:
             self.error_occurred.emit(f"扫描错误: {e}")
         finally:
             self.cleanup()
     
-    def _scan_frame(self, image) -> Optional[str]:
-        """扫描单帧图像"""
+    def _capture_loop(self):
+        """截帧线程：持续推进直播流，按扫描耗时每隔若干帧解码一帧放入单帧槽（覆盖未被取走的旧帧）"""
+        frame_count = 0
+        while not self._stop_event.is_set():
+            # 🚀 grab只推进流位置，跳过的帧不做颜色转换
+            if not self.cap.grab():
+                self._stream_ended = True
+                self._frame_ready.set()
+                break
+            
+            frame_count += 1
+            
+            # 🚀 只解码扫描线程来得及处理的帧（间隔由上一帧的扫描耗时决定）
+            if frame_count < self._frame_skip:
+                continue
+            frame_count = 0
+            
+            ret, frame = self.cap.retrieve()
+            if ret:
+                with self._lock:
+                    self._latest = frame
+                    self._frame_ready.set()
+    
+    @staticmethod
+    def _ensure_buffer(buf, shape):
+        """返回指定尺寸的uint8缓冲区（尺寸不变时复用，直播切换分辨率时重新分配）"""
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+        return buf
+    
+    @staticmethod
+    def _resolve_scanner():
+        """获取QR扫描器：优先AI扫描器，加载失败则使用普通扫描器"""
         try:
             from utils.ai_qr_scanner import ai_qr_scanner
-            
-            # 使用AI扫描器的try_decode_qr方法
-            return ai_qr_scanner.try_decode_qr(image)
+            return ai_qr_scanner
+        except Exception:
+            from utils.qr_scanner import qr_scanner
+            return qr_scanner
+    
+    def _scan_frame_with_roi(self, gray) -> Optional[str]:
+        """
+        🚀 先只扫描预测的二维码区域（像素远少于整帧），失败再扫描整帧
+        识别成功后定位二维码并记录，用于预测下一帧的位置
+        """
+        offset_x = offset_y = 0
+        region = gray
+        qr_code = None
+        
+        roi = self._roi_detector.get_predicted_roi()
+        if roi:
+            x, y, w, h = roi
+            x, y = max(0, x), max(0, y)
+            sub = gray[y:y + h, x:x + w]
+            if sub.size:
+                qr_code = self._scan_frame(sub)
+                self._roi_detector.verify_prediction(qr_code is not None)
+                if qr_code:
+                    region, offset_x, offset_y = sub, x, y
+        
+        if not qr_code:
+            qr_code = self._scan_frame(gray)
+        
+        if qr_code:
+            rect = self._locate_qr(region)
+            if rect:
+                left, top, width, height = rect
+                self._roi_detector.add_detection(left + offset_x, top + offset_y, width, height)
+        
+        return qr_code
+    
+    @staticmethod
+    def _locate_qr(gray) -> Optional[tuple]:
+        """定位灰度图中的二维码，返回 (left, top, width, height)"""
+        if not PYZBAR_AVAILABLE:
+            return None
+        try:
+            h, w = gray.shape[:2]
+            decoded = zbar_decode((gray.tobytes(), w, h), symbols=[ZBarSymbol.QRCODE])
+            if decoded:
+                return tuple(decoded[0].rect)
+        except Exception:
+            pass
+        return None
+    
+    def _scan_frame(self, image) -> Optional[str]:
+        """扫描单帧图像（灰度或BGR ndarray）"""
+        try:
+            # 使用扫描器的try_decode_qr方法
+            return self._scanner.try_decode_qr(image)
         except Exception as e:
             print(f"[LiveStream] Scan error: {e}")
             return None
@@ -218,10 +368,16 @@ class LiveStreamScanner(QThread):
     def stop(self):
         """停止扫描"""
         self.is_running = False
+        self._stop_event.set()
         self.status_changed.emit("正在停止...")
     
     def cleanup(self):
         """清理资源"""
+        # 先停止截帧线程，再释放VideoCapture（不能在grab进行中释放）
+        self._stop_event.set()
+        if self._capture_thread is not None:
+            self._capture_thread.join()
+            self._capture_thread = None
         if self.cap:
             self.cap.release()
             self.cap = None
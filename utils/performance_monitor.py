@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
 """Performance monitoring system for QR code scanning"""
+import sys
 import time
 from typing import Dict, List, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from collections import defaultdict
 
+# slots=True drops the per-instance __dict__ (Python 3.10+; plain dataclass on older versions)
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_DATACLASS_SLOTS)
 class PerformanceMetrics:
     """Performance metrics for a single scan operation"""
     # Timestamps
@@ -38,14 +42,26 @@ class PerformanceMetrics:
     roi_accuracy: bool = False
 
 
+# Preallocated metrics slots (power of two, larger than max_history so the
+# slot being written never overlaps the history a reader walks)
+_RING_SIZE = 128
+_RING_MASK = _RING_SIZE - 1
+_METRIC_DEFAULTS = tuple((f.name, f.default) for f in fields(PerformanceMetrics))
+
+
 class PerformanceMonitor:
     """Global performance monitor singleton"""
     
     def __init__(self):
         self.current_scan: Optional[PerformanceMetrics] = None
-        self.history: List[PerformanceMetrics] = []
         self.max_history = 100  # Keep last 100 scans
         
+        # Ring of reusable metrics: the scan thread fills slot _cur_idx, readers
+        # only look at slots up to _committed (a plain int store, atomic under the GIL)
+        self._ring = [PerformanceMetrics() for _ in range(_RING_SIZE)]
+        self._cur_idx = -1
+        self._committed = -1
+        
         # Statistics
         self.stats = {
             "total_scans": 0,
@@ -65,8 +81,15 @@ class PerformanceMonitor:
     
     def start_scan(self):
         """Start timing a new scan"""
-        self.current_scan = PerformanceMetrics()
-        self.current_scan.scan_start = time.perf_counter()
+        # Only move on once the previous slot has been committed; a scan that
+        # never reaches end_scan is simply overwritten, so it cannot evict history
+        if self._cur_idx == self._committed:
+            self._cur_idx = (self._cur_idx + 1) & _RING_MASK
+        scan = self._ring[self._cur_idx]
+        for name, default in _METRIC_DEFAULTS:
+            setattr(scan, name, default)
+        scan.scan_start = time.perf_counter()
+        self.current_scan = scan
     
     def mark_screenshot_done(self, method: str = "unknown", image_size: tuple = (0, 0), memory_reused: bool = False):
         """Mark screenshot phase complete"""
@@ -123,10 +146,8 @@ class PerformanceMonitor:
         self.current_scan.scan_end = now
         self.current_scan.total_time = (now - self.current_scan.scan_start) * 1000
         
-        # Add to history
-        self.history.append(self.current_scan)
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
+        # Publish the finished slot to readers
+        self._committed = self._cur_idx
         
         # Update statistics
         self.stats["total_scans"] += 1
@@ -141,22 +162,40 @@ class PerformanceMonitor:
             self.stats["fastest_scan"] = min(self.stats["fastest_scan"], total)
             self.stats["slowest_scan"] = max(self.stats["slowest_scan"], total)
             
-            # Rolling average
+            # Rolling average (incremental mean: avg += (x - avg) / n)
             n = self.stats["successful_scans"]
-            self.stats["avg_total_time"] = (self.stats["avg_total_time"] * (n-1) + total) / n
-            self.stats["avg_screenshot_time"] = (self.stats["avg_screenshot_time"] * (n-1) + self.current_scan.screenshot_time) / n
-            self.stats["avg_qr_detect_time"] = (self.stats["avg_qr_detect_time"] * (n-1) + self.current_scan.qr_detect_time) / n
-            self.stats["avg_api_roleinfo_time"] = (self.stats["avg_api_roleinfo_time"] * (n-1) + self.current_scan.api_roleinfo_time) / n
-            self.stats["avg_api_scanlogin_time"] = (self.stats["avg_api_scanlogin_time"] * (n-1) + self.current_scan.api_scanlogin_time) / n
+            scan = self.current_scan
+            stats = self.stats
+            stats["avg_total_time"] += (total - stats["avg_total_time"]) / n
+            stats["avg_screenshot_time"] += (scan.screenshot_time - stats["avg_screenshot_time"]) / n
+            stats["avg_qr_detect_time"] += (scan.qr_detect_time - stats["avg_qr_detect_time"]) / n
+            stats["avg_api_roleinfo_time"] += (scan.api_roleinfo_time - stats["avg_api_roleinfo_time"]) / n
+            stats["avg_api_scanlogin_time"] += (scan.api_scanlogin_time - stats["avg_api_scanlogin_time"]) / n
         
         self.current_scan = None
     
+    @property
+    def history(self) -> List[PerformanceMetrics]:
+        """Completed scans from the last max_history slots, oldest first"""
+        committed = self._committed
+        if committed < 0:
+            return []
+        
+        scans = []
+        for i in range(min(self.max_history, _RING_SIZE - 1)):
+            scan = self._ring[(committed - i) & _RING_MASK]
+            if scan.scan_end:  # Skip never-used slots
+                scans.append(scan)
+        scans.reverse()
+        return scans
+    
     def get_last_scan_summary(self) -> str:
         """Get summary of last scan"""
-        if not self.history:
+        committed = self._committed
+        if committed < 0:
             return "No scans yet"
         
-        last = self.history[-1]
+        last = self._ring[committed]
         
         summary = f"""
 ┌─ Scan Performance Report ─────────────────────┐
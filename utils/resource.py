@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+资源路径工具（兼容开发环境和PyInstaller打包环境）
+"""
+import os
+import sys
+from functools import lru_cache
+from typing import Optional
+
+
+def _base_path() -> str:
+    """获取资源根目录"""
+    if getattr(sys, 'frozen', False):
+        # 打包环境：资源解压在 _MEIPASS
+        return sys._MEIPASS
+    # 开发环境：项目根目录
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@lru_cache(maxsize=None)
+def resource_path(name: str) -> Optional[str]:
+    """
+    获取资源文件的绝对路径（结果缓存，只访问一次磁盘）
+    
+    Args:
+        name: 相对于资源根目录的路径
+    
+    Returns:
+        文件存在时返回绝对路径，否则返回 None
+    """
+    path = os.path.join(_base_path(), name)
+    return path if os.path.exists(path) else None
+
+
+_app_icon = None
+
+def get_app_icon():
+    """获取程序图标单例（优先使用编译的Qt资源）"""
+    global _app_icon
+    if _app_icon is None:
+        from PySide6.QtGui import QIcon
+        try:
+            import resources_rc  # noqa: F401
+            _app_icon = QIcon(":/icons/11409B.png")
+        except ImportError:
+            path = resource_path("11409B.png")
+            _app_icon = QIcon(path) if path else QIcon()
+    return _app_icon
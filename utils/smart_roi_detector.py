@@ -29,6 +29,11 @@ class SmartROIDetector:
         # Position history: [(x, y, width, height, timestamp), ...]
         self.position_history: deque = deque(maxlen=history_size)
         
+        # Last `confidence_threshold` positions with running sums of x/y/w/h
+        # (integer sums, so averages are O(1) and never drift)
+        self._recent: deque = deque(maxlen=confidence_threshold)
+        self._sums = [0, 0, 0, 0]
+        
         # Current prediction
         self.predicted_roi: Optional[Tuple[int, int, int, int]] = None
         self.prediction_confidence: float = 0.0
@@ -45,7 +50,18 @@ class SmartROIDetector:
             x, y: Top-left corner of detected QR region
             width, height: Size of detected QR region
         """
-        self.position_history.append((x, y, width, height, time.time()))
+        entry = (x, y, width, height, time.time())
+        self.position_history.append(entry)
+        
+        sums = self._sums
+        if len(self._recent) == self._recent.maxlen:
+            evicted = self._recent[0]
+            for i in range(4):
+                sums[i] -= evicted[i]
+        self._recent.append(entry)
+        for i in range(4):
+            sums[i] += entry[i]
+        
         self._update_prediction()
     
     def _update_prediction(self):
@@ -56,24 +72,23 @@ class SmartROIDetector:
             return
         
         # Check if recent positions are similar (within 10% tolerance)
-        recent_positions = list(self.position_history)[-self.confidence_threshold:]
+        recent_positions = self._recent
         
-        # Calculate average position
-        avg_x = sum(pos[0] for pos in recent_positions) / len(recent_positions)
-        avg_y = sum(pos[1] for pos in recent_positions) / len(recent_positions)
-        avg_w = sum(pos[2] for pos in recent_positions) / len(recent_positions)
-        avg_h = sum(pos[3] for pos in recent_positions) / len(recent_positions)
+        # Calculate average position (from running sums)
+        count = len(recent_positions)
+        avg_x, avg_y, avg_w, avg_h = (total / count for total in self._sums)
         
         # Check variance (positions should be close)
         tolerance = 0.15  # 15% tolerance
+        tol_w = avg_w * tolerance
+        tol_h = avg_h * tolerance
         similar_count = 0
         
-        for pos in recent_positions:
-            x, y, w, h, _ = pos
-            if (abs(x - avg_x) < avg_w * tolerance and
-                abs(y - avg_y) < avg_h * tolerance and
-                abs(w - avg_w) < avg_w * tolerance and
-                abs(h - avg_h) < avg_h * tolerance):
+        for x, y, w, h, _ in recent_positions:
+            if (abs(x - avg_x) < tol_w and
+                abs(y - avg_y) < tol_h and
+                abs(w - avg_w) < tol_w and
+                abs(h - avg_h) < tol_h):
                 similar_count += 1
         
         # If enough positions are similar, make prediction
@@ -127,6 +142,8 @@ class SmartROIDetector:
     def reset(self):
         """Reset detector (e.g., when user moves scan window)"""
         self.position_history.clear()
+        self._recent.clear()
+        self._sums = [0, 0, 0, 0]
         self.predicted_roi = None
         self.prediction_confidence = 0.0
     
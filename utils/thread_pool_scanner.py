@@ -2,45 +2,249 @@
 """
 多线程池QR码扫描器（参考MHY_Scanner的QThreadPool实现）
 """
-from PySide6.QtCore import QThreadPool, QRunnable, Signal, QObject
-from typing import Optional, Callable
+from PySide6.QtCore import QThread, QThreadPool, QRunnable, Signal, QObject
+from typing import Optional, Callable, Dict, List
+from collections import deque
+import functools
+import itertools
+import os
+import queue
+import sys
 import threading
+import time
 
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# 提交前预处理的缩放比例（灰度 + 缩小后每次识别读取的数据量约为BGR原图的1/12）
+PREPROCESS_SCALE = 0.5
+
+# 批量识别：攒够这么多帧，或第一帧已等待这么久（秒）就提交一次
+BATCH_SIZE = 4
+BATCH_MAX_WAIT = 0.03
+
+# 识别任务在线程池队列中的优先级（数值越大越先执行）
+DECODE_TASK_PRIORITY = 5
 
 class WorkerSignals(QObject):
-    """Worker信号（用于线程间通信）"""
-    result = Signal(str)  # QR码识别成功
-    error = Signal(str)   # 识别错误
-    finished = Signal()   # 任务完成
+    """Worker信号（用于线程间通信，所有任务共用一个实例，用task_id区分）"""
+    result = Signal(int, str)  # QR码识别成功 (task_id, 内容)
+    error = Signal(int, str)   # 识别错误 (task_id, 错误信息)
+    finished = Signal(int)     # 任务完成 (task_id)
+
+
+# thread_local存储（每个线程独立的扫描器实例）
+_thread_local = threading.local()
+
+# 🚀 日志环形队列：提交/回调路径只append（不碰stdout锁），由后台线程每250ms统一输出
+_log_q: deque = deque(maxlen=1024)
+_log_thread = None
+_log_thread_lock = threading.Lock()
+
+
+def _drain_log():
+    """后台日志线程：定期把队列里的日志打印出来"""
+    while True:
+        time.sleep(0.25)
+        while _log_q:
+            print(_log_q.popleft())
+
+
+def _log(msg: str):
+    """记录日志（不阻塞调用线程）"""
+    global _log_thread
+    _log_q.append(msg)
+    if _log_thread is None:
+        with _log_thread_lock:
+            if _log_thread is None:
+                _log_thread = threading.Thread(target=_drain_log, name="threadpool-log", daemon=True)
+                _log_thread.start()
+
+
+def _thread_decoder(decoder_factory: Callable) -> Callable:
+    """获取当前线程的解码器（首次调用时用工厂创建，之后同一线程直接复用）"""
+    cached = getattr(_thread_local, "decoder", None)
+    if cached is None or cached[0] is not decoder_factory:
+        cached = (decoder_factory, decoder_factory())
+        _thread_local.decoder = cached
+    return cached[1]
+
+
+def _noop():
+    """预热用的空任务"""
+
+
+def _physical_cpu_count() -> int:
+    """物理核心数（同一物理核心上的超线程共享L1/L2，计算密集的识别任务按物理核心分配线程）"""
+    if PSUTIL_AVAILABLE:
+        count = psutil.cpu_count(logical=False)
+        if count:
+            return count
+    return max(1, (os.cpu_count() or 4) // 2)
+
+
+def _pin_current_thread(cpu: int):
+    """把当前线程绑定到指定逻辑CPU（每个线程只绑定一次，失败则忽略）"""
+    if getattr(_thread_local, "pinned_cpu", None) == cpu:
+        return
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), ctypes.c_size_t(1 << cpu))
+        elif hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {cpu})  # Linux上pid=0表示调用线程
+    except Exception:
+        pass
+    _thread_local.pinned_cpu = cpu
+
+
+# ===== 进程池模式（纯Python解码函数绕过GIL）=====
+
+# 进程内注册的解码函数（key -> 函数），提交任务时只传key，不再逐次pickle函数
+_registered_decoders: Dict[str, Callable] = {}
+# 子进程已打开的共享内存（name -> SharedMemory），同一块缓冲区重复使用时不必重新映射
+_attached_shm: Dict[str, object] = {}
+
+
+def _init_process_worker(decoders: Dict[str, Callable]):
+    """进程池子进程初始化：注册解码函数（每个进程只pickle一次）"""
+    _registered_decoders.update(decoders)
+
+
+def _resolve_decoder(decode_func, decoder_factory: Optional[Callable]) -> Callable:
+    """确定实际使用的解码函数：工厂优先，其次已注册的key，最后是函数本身"""
+    if decoder_factory is not None:
+        return _thread_decoder(decoder_factory)
+    if isinstance(decode_func, str):
+        return _registered_decoders[decode_func]
+    return decode_func
+
+
+def _attach_shm(name: str):
+    """
+    子进程打开主进程创建的共享内存
+    
+    POSIX上打开已有的共享内存也会登记到resource_tracker，会被当作子进程自己的资源清理，
+    误删主进程的缓冲区；这里不登记（Python 3.13+用track=False，更早的版本临时跳过登记）
+    """
+    from multiprocessing import shared_memory
+    if sys.platform == "win32":
+        return shared_memory.SharedMemory(name=name)
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _process_decode(payload, decode_func, decoder_factory: Optional[Callable]):
+    """
+    子进程中执行识别
+    
+    Args:
+        payload: ("shm", 共享内存名, shape, dtype) 或 ("raw", 图像数据)
+        decode_func: 解码函数或已注册的key
+        decoder_factory: 解码器工厂（提供时优先使用）
+    """
+    decode = _resolve_decoder(decode_func, decoder_factory)
+    
+    if payload[0] != "shm":
+        return decode(payload[1])
+    
+    _, name, shape, dtype = payload
+    shm = _attached_shm.get(name)
+    if shm is None:
+        for old in _attached_shm.values():
+            old.close()  # 主进程换了更大的缓冲区
+        _attached_shm.clear()
+        shm = _attached_shm[name] = _attach_shm(name)
+    img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        return decode(img)
+    finally:
+        del img  # 释放对共享内存的引用
+
+
+def _decode_batch(decode_func, decoder_factory: Optional[Callable], frames):
+    """
+    在一个任务里依次识别多帧（最新的帧优先），返回第一个识别结果
+    
+    Args:
+        decode_func: 解码函数或已注册的key
+        decoder_factory: 解码器工厂（提供时优先使用）
+        frames: 帧列表，或按第0维堆叠的ndarray（经共享内存传入子进程）
+    """
+    decode = _resolve_decoder(decode_func, decoder_factory)
+    for frame in reversed(frames):
+        result = decode(frame)
+        if result:
+            return result
+    return None
 
 
 class QRDecodeWorker(QRunnable):
-    """QR码识别Worker（在线程池中运行）"""
+    """QR码识别Worker（在线程池中运行，完成后放回空闲列表复用）"""
     
-    def __init__(self, img_data, decode_func):
+    def __init__(self, task_id: int, img_data, decode_func, signals: WorkerSignals,
+                 decoder_factory: Optional[Callable] = None, owner: "ThreadPoolScanner" = None):
         """
         初始化Worker
         
         Args:
+            task_id: 任务编号（回调分发用）
             img_data: 图像数据
             decode_func: 解码函数
+            signals: 线程池共用的信号对象（不再每个任务创建QObject）
+            decoder_factory: 解码器工厂（提供时优先使用，每个线程只创建一次解码器）
+            owner: 所属的ThreadPoolScanner（用于检查任务是否已被取消）
         """
         super().__init__()
+        self.task_id = task_id
         self.img_data = img_data
         self.decode_func = decode_func
-        self.signals = WorkerSignals()
-        self.setAutoDelete(True)  # 自动删除
+        self.decoder_factory = decoder_factory
+        self.signals = signals
+        self.owner = owner
+        self.direct_callback: Optional[Callable] = None  # 设置时在worker线程直接回调（不经过Qt信号）
+        self.pin_cpu: Optional[int] = None  # 设置时把执行线程绑定到该逻辑CPU
+        self.setAutoDelete(False)  # 🚀 不自动删除：由ThreadPoolScanner回收复用
     
     def run(self):
         """执行QR码识别（在线程池线程中运行）"""
+        owner = self.owner
+        if self.pin_cpu is not None:
+            _pin_current_thread(self.pin_cpu)
         try:
-            result = self.decode_func(self.img_data)
-            if result:
-                self.signals.result.emit(result)
+            # 🚀 已被新帧取代的任务不再识别
+            if owner is not None and owner.is_stale(self.task_id):
+                return
+            result = _resolve_decoder(self.decode_func, self.decoder_factory)(self.img_data)
+            if result and (owner is None or not owner.is_stale(self.task_id)):
+                if self.direct_callback is not None:
+                    self.direct_callback(result)
+                else:
+                    self.signals.result.emit(self.task_id, result)
         except Exception as e:
-            self.signals.error.emit(str(e))
+            self.signals.error.emit(self.task_id, str(e))
         finally:
-            self.signals.finished.emit()
+            self.signals.finished.emit(self.task_id)
 
 
 class ThreadPoolScanner:
@@ -50,35 +254,112 @@ class ThreadPoolScanner:
     特点：
     1. 使用QThreadPool并发处理图像增强和识别
     2. thread_local确保每个线程独立的扫描器实例
-    3. try_lock机制避免重复提交
+    3. 单令牌门控避免重复提交（同一时间只处理一个任务）
+    
+    注意：decode_func 必须在耗时部分释放GIL，多线程才有真正的并行加速。
+    OpenCV（cv2.*）、pyzbar（ctypes调用zbar）和 nogil 的Numba内核都会释放GIL；
+    纯Python的解码函数请使用 use_processes=True（进程池：ndarray图像经共享内存传给子进程，
+    不做pickle；decode_func可以是在 decoders 中注册的key，否则需可pickle；
+    打包成exe时主程序入口需调用 multiprocessing.freeze_support()）。
     """
     
     # thread_local存储（每个线程独立的扫描器实例）
-    _thread_local = threading.local()
+    _thread_local = _thread_local
     
-    def __init__(self, max_workers: int = None):
+    def __init__(self, max_workers: int = None, use_processes: bool = False, pin_threads: bool = False,
+                 decoders: Optional[Dict[str, Callable]] = None):
         """
         初始化线程池扫描器
         
         Args:
-            max_workers: 最大线程数（None=自动检测CPU核心数）
+            max_workers: 最大线程数（None=自动检测物理核心数）
+            use_processes: 使用进程池执行decode_func（用于不释放GIL的纯Python解码函数）
+            pin_threads: 把每个worker线程绑定到不同的物理核心（减少线程迁移和缓存失效）
+            decoders: 注册的解码函数（key -> 函数），提交时传key即可；进程池模式下也注册到子进程
         """
-        import os
-        
-        # 🚀 自动检测CPU核心数（与MHY_Scanner相同）
+        _registered_decoders.update(decoders or {})
+        # 🚀 自动检测物理核心数（超线程对计算密集的识别帮助很小）
         if max_workers is None:
-            max_workers = os.cpu_count() or 4  # 自动检测，失败则默认4
+            max_workers = _physical_cpu_count()
+        
+        # 🚀 每个worker一个独立的单线程池，轮询分发（不共用一个任务队列，
+        # 也不占用Qt全局线程池的线程）
+        self._pools = []
+        self._process_pool = None
+        self._futures = set()  # 进程池中未完成的任务
+        self._shm = None       # 向子进程传图像的共享内存（按需扩容）
+        if use_processes:
+            from concurrent.futures import ProcessPoolExecutor
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_process_worker,
+                initargs=(dict(decoders or {}),),
+            )
+            # 🚀 预先拉起子进程（进程启动比线程慢得多）
+            for _ in range(max_workers):
+                self._process_pool.submit(_noop)
+        for _ in range(0 if use_processes else max_workers):
+            pool = QThreadPool()
+            pool.setMaxThreadCount(1)
+            pool.setThreadPriority(QThread.Priority.HighPriority)  # 识别线程优先于后台线程调度
+            # 🚀 预先启动线程并永不回收：首个识别任务不再等待线程创建
+            pool.setExpiryTimeout(-1)
+            pool.start(_noop)
+            self._pools.append(pool)
+        # 第i个线程池绑定的逻辑CPU（按超线程数跨步，使每个线程落在不同物理核心上）
+        logical = os.cpu_count() or max_workers
+        stride = max(1, logical // _physical_cpu_count())
+        pin_cpus = [(i * stride) % logical if pin_threads else None for i in range(len(self._pools))]
+        self._rr = itertools.cycle(list(zip(self._pools, pin_cpus)))
+        self._max_workers = max_workers
+        
+        # 🚀 单令牌门控（类似MHY的mutex.try_lock()）：取走令牌=开始处理，任务完成时放回
+        self._gate = queue.SimpleQueue()
+        self._gate.put(None)
+        
+        # 🚀 共用一个信号对象，只连接一次（每个任务不再创建QObject和lambda连接）
+        self._signals = WorkerSignals()
+        self._signals.result.connect(self._on_task_result)
+        self._signals.finished.connect(self._on_task_finished)
+        self._task_ids = itertools.count(1)
+        self._active_task: Optional[int] = None  # 当前持有令牌的任务（被取消后为None）
+        self._callbacks: Dict[int, Callable] = {}  # task_id -> 成功回调
         
-        self.thread_pool = QThreadPool.globalInstance()
-        self.thread_pool.setMaxThreadCount(max_workers)
+        # 🚀 Worker复用：空闲列表 + 运行中的Worker（task_id -> Worker，同时保持Python引用）
+        self._free_workers = queue.SimpleQueue()
+        self._running_workers: Dict[int, QRDecodeWorker] = {}
         
-        # 处理锁（类似MHY的mutex.try_lock()）
-        self.processing_lock = threading.Lock()
-        self.is_processing = False
+        # 🚀 批量识别：待提交的帧（满了丢弃最旧的）
+        self._batch: deque = deque(maxlen=BATCH_SIZE)
+        self._batch_started = 0.0
         
-        print(f"[ThreadPool] Initialized with {max_workers} workers (MHY-style)")
+        _log(f"[ThreadPool] Initialized with {max_workers} workers (MHY-style)")
     
-    def submit_decode_task(self, img_data, decode_func, on_success: Optional[Callable] = None):
+    @staticmethod
+    def preprocess(img_data, scale: float = PREPROCESS_SCALE):
+        """
+        🚀 提交前转灰度并缩小（OpenCV SIMD，每帧只做一次，worker直接读取小图）
+        
+        Args:
+            img_data: BGR或灰度ndarray
+            scale: 缩放比例
+        
+        Returns:
+            连续内存的灰度ndarray（没有OpenCV或不是ndarray时原样返回）
+        """
+        if not OPENCV_AVAILABLE or not isinstance(img_data, np.ndarray):
+            return img_data
+        gray = img_data if img_data.ndim == 2 else cv2.cvtColor(img_data, cv2.COLOR_BGR2GRAY)
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(gray)
+    
+    def submit_decode_task(self, img_data, decode_func: Optional[Callable] = None,
+                           on_success: Optional[Callable] = None,
+                           decoder_factory: Optional[Callable] = None,
+                           preprocess: bool = False,
+                           replace_in_flight: bool = False,
+                           direct_callback: bool = False):
         """
         提交QR码识别任务到线程池（类似MHY的threadPool.tryStart）
         
@@ -86,67 +367,258 @@ class ThreadPoolScanner:
             img_data: 图像数据
             decode_func: 解码函数
             on_success: 成功回调
+            decoder_factory: 解码器工厂（无参调用，返回解码函数）；提供时每个线程只创建
+                一次解码器并缓存复用，应传入长期存在的函数而不是每次新建的lambda
+            preprocess: 提交前先转灰度并缩小到PREPROCESS_SCALE（decode_func需接受灰度图）
+            replace_in_flight: 有任务正在处理时取消它并提交新帧（默认丢弃新帧）
+            direct_callback: 在worker线程中直接调用on_success（省去Qt事件循环的一次跳转）；
+                on_success必须线程安全，操作界面的回调请保持默认的信号方式
         
         Returns:
             bool: 是否成功提交（如果正在处理则返回False）
         """
-        # 🚀 MHY优化：try_lock机制（非阻塞锁）
-        if not self.processing_lock.acquire(blocking=False):
-            # print("[ThreadPool] Previous task still processing, skipping")
+        if replace_in_flight:
+            self.cancel_in_flight()
+        
+        # 🚀 MHY优化：非阻塞取令牌（取不到说明上一个任务还在处理）
+        try:
+            self._gate.get_nowait()
+        except queue.Empty:
             return False
         
+        task_id = next(self._task_ids)
+        self._active_task = task_id
+        submitted = False
         try:
-            # 创建Worker
-            worker = QRDecodeWorker(img_data, decode_func)
-            
-            # 连接信号
-            if on_success:
-                worker.signals.result.connect(on_success)
+            if preprocess:
+                img_data = self.preprocess(img_data)
             
-            worker.signals.finished.connect(lambda: self._on_task_finished())
-            
-            # 🚀 提交到线程池（类似MHY的threadPool.tryStart）
-            success = self.thread_pool.tryStart(worker)
-            
-            if success:
-                self.is_processing = True
-                return True
+            # 创建Worker（登记回调，结果按task_id分发）
+            if on_success and not direct_callback:
+                self._callbacks[task_id] = on_success
+            direct = on_success if direct_callback else None
+            if self._process_pool is not None:
+                # 进程池：完成回调里发出与QRDecodeWorker相同的信号
+                future = self._process_pool.submit(
+                    _process_decode, self._share_image(img_data), decode_func, decoder_factory
+                )
+                self._futures.add(future)
+                future.add_done_callback(functools.partial(self._on_process_done, task_id, direct))
+                submitted = True
             else:
-                # 线程池满了，释放锁
-                self.processing_lock.release()
-                return False
+                worker = self._acquire_worker(task_id, img_data, decode_func, decoder_factory)
+                worker.direct_callback = direct
+                pool, worker.pin_cpu = next(self._rr)
+                self._running_workers[task_id] = worker
                 
+                # 🚀 提交到线程池：门控已保证同时只有一个任务，不需要tryStart的容量检查
+                pool.start(worker, DECODE_TASK_PRIORITY)
+                submitted = True
         except Exception as e:
-            print(f"[ThreadPool] Failed to submit task: {e}")
-            self.processing_lock.release()
+            _log(f"[ThreadPool] Failed to submit task: {e}")
+        
+        if not submitted:
+            # 提交失败，放回令牌（任务不会运行，也就不会有完成回调）
+            self._callbacks.pop(task_id, None)
+            self._release_worker(task_id)
+            self._active_task = None
+            self._gate.put(None)
+        return submitted
+    
+    def _share_image(self, img_data):
+        """
+        🚀 进程池模式：把ndarray写入共享内存，只把(名字, 形状, 类型)传给子进程
+        
+        门控保证同时只有一个任务，一块缓冲区足够（取消后立即提交的新帧可能覆盖
+        旧任务正在读的数据，但旧任务的结果本来就会被丢弃）
+        """
+        if not isinstance(img_data, np.ndarray):
+            return ("raw", img_data)
+        
+        if self._shm is None or self._shm.size < img_data.nbytes:
+            from multiprocessing import shared_memory
+            self._close_shm()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, img_data.nbytes))
+        
+        np.ndarray(img_data.shape, dtype=img_data.dtype, buffer=self._shm.buf)[...] = img_data
+        return ("shm", self._shm.name, img_data.shape, img_data.dtype.str)
+    
+    def _close_shm(self):
+        """释放共享内存缓冲区"""
+        if self._shm is not None:
+            try:
+                self._shm.close()
+                self._shm.unlink()
+            except Exception:
+                pass
+            self._shm = None
+    
+    def shutdown(self):
+        """关闭进程池并释放共享内存（线程池模式无需调用）"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        self._close_shm()
+    
+    def cancel_in_flight(self) -> bool:
+        """
+        🚀 取消正在处理的任务：它的结果会被丢弃（尚未开始则直接跳过识别），
+        令牌立即放回，可以马上提交新帧（二维码会移动，新帧比旧结果更有价值）
+        
+        Returns:
+            bool: 是否有任务被取消
+        """
+        task_id = self._active_task
+        if task_id is None:
             return False
+        self._active_task = None
+        self._callbacks.pop(task_id, None)
+        self._gate.put(None)
+        return True
+    
+    def is_stale(self, task_id: int) -> bool:
+        """任务是否已被取消（在worker线程中调用，只读一个int）"""
+        return self._active_task != task_id
+    
+    def queue_frame(self, img_data, decode_func: Optional[Callable] = None,
+                    on_success: Optional[Callable] = None,
+                    decoder_factory: Optional[Callable] = None,
+                    preprocess: bool = False,
+                    direct_callback: bool = False) -> bool:
+        """
+        🚀 批量提交：帧先攒在本地，攒够BATCH_SIZE帧或等待超过BATCH_MAX_WAIT后
+        作为一个任务提交（一次线程切换和信号往返识别多帧）
+        
+        超时只在调用时检查，适合截图循环这类持续送帧的调用方。
+        参数同 submit_decode_task。
+        
+        Returns:
+            bool: 本次调用是否提交了一批
+        """
+        if preprocess:
+            img_data = self.preprocess(img_data)
+        if not self._batch:
+            self._batch_started = time.monotonic()
+        self._batch.append(img_data)
+        
+        if len(self._batch) < BATCH_SIZE and time.monotonic() - self._batch_started < BATCH_MAX_WAIT:
+            return False
+        
+        frames = list(self._batch)
+        if self._process_pool is not None and self._same_layout(frames):
+            # 进程池：同尺寸的帧堆叠成一个数组，整批经共享内存传给子进程（不做pickle）
+            frames = np.stack(frames)
+        submitted = self.submit_decode_task(
+            frames, functools.partial(_decode_batch, decode_func, decoder_factory), on_success,
+            direct_callback=direct_callback,
+        )
+        if submitted:
+            self._batch.clear()
+        return submitted
+    
+    @staticmethod
+    def _same_layout(frames: List) -> bool:
+        """是否全是尺寸和类型相同的ndarray（可以堆叠成一个数组）"""
+        first = frames[0]
+        return all(
+            isinstance(frame, np.ndarray) and frame.shape == first.shape and frame.dtype == first.dtype
+            for frame in frames
+        )
     
-    def _on_task_finished(self):
+    def _acquire_worker(self, task_id: int, img_data, decode_func, decoder_factory) -> QRDecodeWorker:
+        """从空闲列表取一个Worker并填入本次任务（没有空闲的才新建）"""
+        try:
+            worker = self._free_workers.get_nowait()
+        except queue.Empty:
+            return QRDecodeWorker(task_id, img_data, decode_func, self._signals, decoder_factory, self)
+        worker.task_id = task_id
+        worker.img_data = img_data
+        worker.decode_func = decode_func
+        worker.decoder_factory = decoder_factory
+        return worker
+    
+    def _release_worker(self, task_id: int):
+        """任务结束后放回空闲列表（清掉图像引用，避免持有大数组）"""
+        worker = self._running_workers.pop(task_id, None)
+        if worker is not None:
+            worker.img_data = None
+            worker.decode_func = None
+            worker.decoder_factory = None
+            worker.direct_callback = None
+            self._free_workers.put(worker)
+    
+    @property
+    def is_processing(self) -> bool:
+        """是否有任务正在处理（令牌已被取走）"""
+        return self._gate.empty()
+    
+    def _on_process_done(self, task_id: int, direct: Optional[Callable], future):
+        """进程池任务完成（在进程池的管理线程中调用）"""
+        self._futures.discard(future)
+        try:
+            result = future.result()
+            if result and direct is not None:
+                if not self.is_stale(task_id):
+                    direct(result)
+            elif result:
+                self._signals.result.emit(task_id, result)
+        except Exception as e:
+            self._signals.error.emit(task_id, str(e))
+        finally:
+            self._signals.finished.emit(task_id)
+    
+    def _on_task_result(self, task_id: int, result: str):
+        """识别成功：分发给该任务的回调"""
+        if self.is_stale(task_id):
+            return
+        callback = self._callbacks.get(task_id)
+        if callback:
+            callback(result)
+    
+    def _on_task_finished(self, task_id: int):
         """任务完成回调"""
-        self.is_processing = False
-        if self.processing_lock.locked():
-            self.processing_lock.release()
+        self._callbacks.pop(task_id, None)
+        self._release_worker(task_id)
+        # 被取消的任务在取消时已经放回令牌
+        if task_id == self._active_task:
+            self._active_task = None
+            self._gate.put(None)
     
     def active_thread_count(self) -> int:
         """获取活跃线程数"""
-        return self.thread_pool.activeThreadCount()
+        if self._process_pool is not None:
+            return len(self._futures)
+        return sum(pool.activeThreadCount() for pool in self._pools)
     
     def max_thread_count(self) -> int:
         """获取最大线程数"""
-        return self.thread_pool.maxThreadCount()
+        return self._max_workers
     
     def wait_for_done(self, timeout: int = 5000):
-        """等待所有任务完成（毫秒）"""
-        return self.thread_pool.waitForDone(timeout)
+        """等待所有任务完成（毫秒，所有线程池共用同一个截止时间）"""
+        if self._process_pool is not None:
+            from concurrent.futures import wait
+            _, not_done = wait(list(self._futures), timeout=timeout / 1000)
+            return not not_done
+        
+        deadline = time.monotonic() + timeout / 1000
+        for pool in self._pools:
+            remaining = max(0, int((deadline - time.monotonic()) * 1000))
+            if not pool.waitForDone(remaining):
+                return False
+        return True
 
 
 # 全局线程池实例
 _global_thread_pool = None
+_global_thread_pool_lock = threading.Lock()
 
-def get_thread_pool_scanner(max_workers: int = None) -> ThreadPoolScanner:
-    """获取全局线程池扫描器单例"""
+def get_thread_pool_scanner(max_workers: int = None, use_processes: bool = False,
+                            pin_threads: bool = False) -> ThreadPoolScanner:
+    """获取全局线程池扫描器单例（参数只在首次创建时生效，多线程同时调用也只创建一次）"""
     global _global_thread_pool
     if _global_thread_pool is None:
-        _global_thread_pool = ThreadPoolScanner(max_workers)
+        with _global_thread_pool_lock:
+            if _global_thread_pool is None:
+                _global_thread_pool = ThreadPoolScanner(max_workers, use_processes, pin_threads)
     return _global_thread_pool
-